@@ -1,36 +1,128 @@
 from tkinter import *
+from calculator_engine import (BACKENDS, EvaluationPool, EvaluationStopped, LiveEvaluator, 
+							   ResultTooLarge, check_size, compile_expression, format_number) 
 
 expression = "" 
 
+# Keeps a running result as keys are pressed 
+live = LiveEvaluator() 
+
+# The evaluation running in the worker pool, if any, and how often 
+# (in ms) it is checked on 
+job = None 
+POLL_MS = 50 
+
 def press(num): 
 
 	global expression
 
+	cancel_job() 
+
 	expression = expression + str(num) 
 
 	equation.set(expression) 
 
+	live.feed(str(num)) 
+
+	show_preview() 
+
+def show_preview(): 
+
+	value = live.preview() 
+
+	preview.set("" if value is None else "= " + format_number(value)) 
+
 def equalpress(): 
 
+	cancel_job() 
+
 	try: 
 
-		global expression 
+		global expression, job, polling 
+
+		value = live.result(fallback=False) 
+
+		if value is None: 
+
+			# a huge power: refused if the result would be too big, 
+			# otherwise worked out in a worker process, so the window 
+			# keeps responding and Clear can stop it 
+			check_size(compile_expression(live.text), live.backend) 
+
+			job = pool.submit(live.text, live.backend) 
+
+			equation.set(" working... ") 
+
+			polling = gui.after(POLL_MS, check_job) 
 
-		total = str(eval(expression)) 
+		else: 
 
-		equation.set(total) 
+			equation.set(format_number(value)) 
 
 		expression = ""
+	except ResultTooLarge: 
+
+		equation.set(" too large ") 
+		expression = "" 
 	except: 
 
 		equation.set(" error ") 
 		expression = "" 
 
+	live.clear() 
+	preview.set("") 
+
+
+def check_job(): 
+	global job, polling 
+	for finished, value, error in pool.poll(): 
+		if finished != job: 
+			continue 
+		job = None 
+		if error is None: 
+			equation.set(format_number(value)) 
+		elif isinstance(error, EvaluationStopped): 
+			equation.set(" stopped ") 
+		elif isinstance(error, MemoryError): 
+			equation.set(" too large ") 
+		else: 
+			equation.set(" error ") 
+	if job is not None: 
+		polling = gui.after(POLL_MS, check_job) 
+
+
+def cancel_job(): 
+	global job 
+	if job is not None: 
+		pool.cancel(job) 
+		gui.after_cancel(polling) 
+		job = None 
+
 
 def clear(): 
 	global expression 
+	cancel_job() 
 	expression = "" 
 	equation.set("") 
+	live.clear() 
+	preview.set("") 
+
+
+# float, decimal or fraction: starts over on what is typed so far 
+def set_mode(name): 
+	global live 
+	live = LiveEvaluator(BACKENDS[name]) 
+	live.feed(expression) 
+	show_preview() 
+
+
+# pasted text goes through press() like typed keys 
+def paste(event): 
+	try: 
+		press(gui.clipboard_get()) 
+	except TclError: 
+		pass 
+	return "break" 
 
 
 # Driver code 
@@ -45,7 +137,7 @@ if __name__ == "__main__":
 	gui.title("Simple Calculator") 
 
 	# set the configuration of GUI window 
-	gui.geometry("270x150") 
+	gui.geometry("270x205") 
 
 	# StringVar() is the variable class 
 	# we create an instance of this class 
@@ -59,6 +151,12 @@ if __name__ == "__main__":
 	# the widgets at respective positions 
 	# in table like structure . 
 	expression_field.grid(columnspan=4, ipadx=70)
+	expression_field.bind("<<Paste>>", paste) 
+
+	# live result of what has been typed so far 
+	preview = StringVar() 
+	preview_label = Label(gui, textvariable=preview, background="light green") 
+	preview_label.grid(row=1, columnspan=4) 
 
 	# create a Buttons and place at a particular 
 	# location inside the root window . 
@@ -131,5 +229,14 @@ if __name__ == "__main__":
 	Decimal= Button(gui, text='.', fg='black', bg='red', 
 					command=lambda: press('.'), height=1, width=7) 
 	Decimal.grid(row=6, column=0) 
+
+	# number type the calculation is done in 
+	mode = StringVar(value="float") 
+	mode_menu = OptionMenu(gui, mode, *BACKENDS, command=set_mode) 
+	mode_menu.grid(row=6, column=1, columnspan=2) 
 	# start the GUI 
+	# workers for results too big to work out while typing 
+	pool = EvaluationPool() 
+
 	gui.mainloop() 
+	pool.close() 
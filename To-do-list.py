@@ -1,55 +1,874 @@
 from tkinter import *
 from tkinter import messagebox
+import itertools
+import os
+import queue
+import re
 import sqlite3 as sql
+import threading
+import time
+from concurrent.futures import Future
 
 # Database Operations
 class TaskDatabase:
-    def __init__(self, db_name='listOfTasks.db'):
-        self.conn = sql.connect(db_name)
+    SCHEMA_VERSION = 6
+    # Change log entries kept for other instances that are behind
+    CHANGE_LOG_KEEP = 10000
+    # Undo steps kept in task_journal
+    JOURNAL_KEEP = 200
+    FTS_INSERT_TRIGGER = '''
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+        END'''
+
+    # Writes are grouped: statements run inside one open transaction that is
+    # committed once batch_size writes are pending, or flush_delay ms after
+    # the first one when a scheduler (e.g. Tk's root.after) is given.
+    # Without a scheduler the caller flushes, and close() always does.
+    #
+    # Several instances may share one file. Writers wait up to busy_timeout
+    # seconds for each other, and every write transaction starts IMMEDIATE
+    # so it takes the write lock up front instead of failing to upgrade a
+    # read. Each write is also recorded in task_changes under this
+    # connection's source id, for the other instances to replay.
+    def __init__(self, db_name='listOfTasks.db', batch_size=256, flush_delay=50, schedule=None,
+                 busy_timeout=10.0):
+        self.conn = sql.connect(db_name, timeout=busy_timeout, isolation_level='IMMEDIATE')
         self.cursor = self.conn.cursor()
-        self.cursor.execute('CREATE TABLE IF NOT EXISTS tasks (title TEXT, completed INTEGER)')
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        self.cursor.execute('PRAGMA synchronous=NORMAL')
+        self.migrate()
+        self.source = os.urandom(8).hex()
+        self.claim_journal()
+        self.data_version = None
+        self.last_change = 0
+        self.batch_size = batch_size
+        self.flush_delay = flush_delay
+        self.schedule = schedule
+        self.pending = 0
+        self.flush_scheduled = False
 
-    def add_task(self, task):
-        self.cursor.execute('INSERT INTO tasks (title, completed) VALUES (?, ?)', (task, 0))
+    def migrate(self):
+        # Upgrade the file in place, one step per schema version, each step
+        # in its own transaction together with the new user_version
+        version = self.cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1 and self.begin_migration(1):
+            # Version 0 is the original (title, completed) table with no key.
+            # Rebuild it with an integer primary key, a unique title index and
+            # timestamps, keeping the first copy of any duplicated title.
+            self.cursor.execute('CREATE TABLE IF NOT EXISTS tasks (title TEXT, completed INTEGER)')
+            self.cursor.execute('''
+                CREATE TABLE tasks_v1 (
+                    id INTEGER PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    created_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),
+                    updated_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now'))
+                )''')
+            self.cursor.execute('CREATE UNIQUE INDEX tasks_title ON tasks_v1 (title)')
+            self.cursor.execute('''
+                INSERT OR IGNORE INTO tasks_v1 (title, completed)
+                SELECT title, COALESCE(completed, 0) FROM tasks
+                WHERE title IS NOT NULL ORDER BY rowid''')
+            self.cursor.execute('DROP TABLE tasks')
+            self.cursor.execute('ALTER TABLE tasks_v1 RENAME TO tasks')
+            self.cursor.execute('PRAGMA user_version = 1')
+            self.conn.commit()
+        if version < 2 and self.begin_migration(2):
+            # Full-text index over titles. External content: the text lives
+            # only in tasks, and triggers keep the index in step with it.
+            self.cursor.execute(
+                "CREATE VIRTUAL TABLE tasks_fts USING fts5(title, content='tasks', content_rowid='id')"
+            )
+            self.cursor.execute(self.FTS_INSERT_TRIGGER)
+            self.cursor.execute('''
+                CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                    INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+                END''')
+            self.cursor.execute('''
+                CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title ON tasks BEGIN
+                    INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+                    INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+                END''')
+            self.cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+            self.cursor.execute('PRAGMA user_version = 2')
+            self.conn.commit()
+        if version < 3 and self.begin_migration(3):
+            # Partial indexes over each completion state, so the active list
+            # costs as much as the active tasks however long the history, and
+            # a cold table that old completed tasks are archived to
+            self.cursor.execute('UPDATE tasks SET completed = 1 WHERE completed NOT IN (0, 1)')
+            self.cursor.execute('CREATE INDEX tasks_active ON tasks (id) WHERE completed = 0')
+            self.cursor.execute('CREATE INDEX tasks_done ON tasks (updated_at) WHERE completed = 1')
+            self.cursor.execute('''
+                CREATE TABLE tasks_archive (
+                    archive_id INTEGER PRIMARY KEY,
+                    id INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    updated_at INTEGER NOT NULL,
+                    archived_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now'))
+                )''')
+            self.cursor.execute('PRAGMA user_version = 3')
+            self.conn.commit()
+        if version < 4 and self.begin_migration(4):
+            # Change log for other instances sharing the file: one row per
+            # task added, deleted or updated, or a single 'clear'
+            self.cursor.execute('''
+                CREATE TABLE task_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    task_id INTEGER,
+                    source TEXT NOT NULL
+                )''')
+            self.cursor.execute('PRAGMA user_version = 4')
+            self.conn.commit()
+        if version < 5 and self.begin_migration(5):
+            # Undo journal: one row per edit holding what it takes to revert
+            # or repeat it, never a copy of the task list. Entries up to
+            # journal_cursor are applied, later ones can be redone.
+            # Delete All only raises floor_id: tasks at or below it are
+            # hidden, and undoing it puts the old floor back.
+            self.cursor.execute('''
+                CREATE TABLE task_journal (
+                    seq INTEGER PRIMARY KEY,
+                    op TEXT NOT NULL,
+                    task_id INTEGER,
+                    title TEXT,
+                    before INTEGER,
+                    after INTEGER
+                )''')
+            self.cursor.execute('CREATE TABLE task_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            self.cursor.execute("INSERT INTO task_meta VALUES ('journal_cursor', 0), ('floor_id', 0)")
+            self.cursor.execute('PRAGMA user_version = 5')
+            self.conn.commit()
+        if version < 6 and self.begin_migration(6):
+            # Each instance undoes only its own edits: journal entries and
+            # cursors belong to a connection's source, and '' marks the
+            # history the last instance to close left for the next to open.
+            # A cursor is now the seq of that source's last applied entry.
+            self.cursor.execute("ALTER TABLE task_journal ADD COLUMN source TEXT NOT NULL DEFAULT ''")
+            self.cursor.execute('CREATE INDEX task_journal_source ON task_journal (source, seq)')
+            self.cursor.execute('CREATE TABLE task_journal_cursor (source TEXT PRIMARY KEY, seq INTEGER NOT NULL)')
+            self.cursor.execute(
+                "INSERT INTO task_journal_cursor SELECT '', value FROM task_meta WHERE key = 'journal_cursor'"
+            )
+            self.cursor.execute("DELETE FROM task_meta WHERE key = 'journal_cursor'")
+            self.cursor.execute('PRAGMA user_version = 6')
+            self.conn.commit()
+        version = self.cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            # Written by a newer version of this program, or a step above
+            # left out; either way the tables are not the ones used here
+            raise sql.DatabaseError(f'task list schema version is {version}, expected {self.SCHEMA_VERSION}')
+        self.cursor.execute(
+            'DELETE FROM task_changes WHERE seq <= (SELECT MAX(seq) FROM task_changes) - ?',
+            (self.CHANGE_LOG_KEEP,)
+        )
         self.conn.commit()
 
-    def delete_task(self, task):
-        self.cursor.execute('DELETE FROM tasks WHERE title = ?', (task,))
+    def begin_migration(self, version):
+        # Another instance may have run this step while we waited for the lock
+        self.cursor.execute('BEGIN IMMEDIATE')
+        if self.cursor.execute('PRAGMA user_version').fetchone()[0] < version:
+            return True
         self.conn.commit()
+        return False
+
+    def written(self, count=1):
+        self.pending += count
+        if self.pending >= self.batch_size:
+            self.flush()
+        elif self.schedule and not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.schedule(self.flush_delay, self.flush)
+
+    def flush(self):
+        # Commits whatever transaction is open, including one a method
+        # started without writing anything, so the write lock is released
+        self.flush_scheduled = False
+        if self.pending or self.conn.in_transaction:
+            self.conn.commit()
+            self.pending = 0
+
+    def log_change(self, op, task_id=None):
+        self.cursor.execute(
+            'INSERT INTO task_changes (op, task_id, source) VALUES (?, ?, ?)', (op, task_id, self.source)
+        )
+
+    def add_task(self, task):
+        # Returns the new task id, or None if the title already exists
+        self.cursor.execute('INSERT OR IGNORE INTO tasks (title) VALUES (?)', (task,))
+        if not self.cursor.rowcount:
+            # A task hidden by Delete All gives up its title for good. The
+            # new id is set explicitly in case the hidden one was the newest.
+            floor = self.floor()
+            self.cursor.execute('DELETE FROM tasks WHERE title = ? AND id <= ?', (task, floor))
+            if not self.cursor.rowcount:
+                return None
+            last_id = self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tasks').fetchone()[0]
+            self.cursor.execute('INSERT INTO tasks (id, title) VALUES (?, ?)', (max(last_id, floor) + 1, task))
+        task_id = self.cursor.lastrowid
+        self.log_change('add', task_id)
+        self.record('add', task_id, task)
+        self.written()
+        return task_id
+
+    def add_tasks(self, tasks):
+        # Bulk load in a single transaction, skipping existing titles.
+        # Returns the number of tasks actually added. The per-row full-text
+        # trigger is about 5x slower than indexing the new rows in one pass,
+        # so it is dropped for the load, inside a savepoint so a failure
+        # cannot leave it missing. Bulk loads are not journaled for undo;
+        # titles hidden by Delete All are taken over as in add_task.
+        if not self.conn.in_transaction:
+            self.cursor.execute('BEGIN IMMEDIATE')
+        self.cursor.execute('SAVEPOINT add_tasks')
+        try:
+            floor = self.floor()
+            if self.cursor.execute('SELECT 1 FROM tasks WHERE id <= ? LIMIT 1', (floor,)).fetchone():
+                tasks = list(tasks)
+                self.cursor.executemany(
+                    'DELETE FROM tasks WHERE title = ? AND id <= ?', ((task, floor) for task in tasks)
+                )
+            last_id = self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tasks').fetchone()[0]
+            self.cursor.execute('DROP TRIGGER tasks_fts_insert')
+            self.cursor.executemany(
+                'INSERT OR IGNORE INTO tasks (id, title) VALUES (?, ?)',
+                zip(itertools.count(max(last_id, floor) + 1), tasks)
+            )
+            added = max(self.cursor.rowcount, 0)
+            self.cursor.execute(
+                'INSERT INTO tasks_fts (rowid, title) SELECT id, title FROM tasks WHERE id > ?', (last_id,)
+            )
+            self.cursor.execute(self.FTS_INSERT_TRIGGER)
+            self.cursor.execute(
+                "INSERT INTO task_changes (op, task_id, source) SELECT 'add', id, ? FROM tasks WHERE id > ?",
+                (self.source, last_id)
+            )
+        except Exception:
+            self.cursor.execute('ROLLBACK TO add_tasks')
+            raise
+        finally:
+            self.cursor.execute('RELEASE add_tasks')
+        self.written(max(added, 1))
+        self.flush()
+        return added
+
+    def find_task(self, task):
+        self.cursor.execute('SELECT id, completed FROM tasks WHERE title = ? AND id > ?', (task, self.floor()))
+        return self.cursor.fetchone()
+
+    def delete_task(self, task):
+        row = self.find_task(task)
+        if row is None:
+            return
+        task_id, completed = row
+        self.remove_row(task_id)
+        self.record('delete', task_id, task, before=completed)
+        self.written()
+
+    def set_completed(self, task, completed):
+        row = self.find_task(task)
+        if row is None:
+            return
+        task_id, before = row
+        self.update_row(task_id, completed)
+        self.record('complete', task_id, task, before=before, after=int(completed))
+        self.written()
+
+    # Row changes shared by the edits above and by undo/redo
+    def remove_row(self, task_id):
+        self.log_change('delete', task_id)
+        self.cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+
+    def restore_row(self, task_id, task, completed):
+        # Puts a task back under its old id, or a new one above the floor if
+        # that was taken or hidden by Delete All meanwhile. Returns the id, or
+        # None if the title exists again. As in add_task, a hidden task with
+        # the same title gives it up.
+        floor = self.floor()
+        self.cursor.execute('DELETE FROM tasks WHERE title = ? AND id <= ?', (task, floor))
+        restored = False
+        if task_id > floor:
+            self.cursor.execute(
+                'INSERT OR IGNORE INTO tasks (id, title, completed) VALUES (?, ?, ?)', (task_id, task, completed)
+            )
+            restored = self.cursor.rowcount
+        if not restored:
+            last_id = self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tasks').fetchone()[0]
+            self.cursor.execute(
+                'INSERT OR IGNORE INTO tasks (id, title, completed) VALUES (?, ?, ?)',
+                (max(last_id, floor) + 1, task, completed)
+            )
+            if not self.cursor.rowcount:
+                return None
+            task_id = self.cursor.lastrowid
+        self.log_change('add', task_id)
+        return task_id
+
+    def update_row(self, task_id, completed):
+        # Returns False if the task is gone, archived or hidden by Delete All
+        self.cursor.execute(
+            "UPDATE tasks SET completed = ?, updated_at = strftime('%s', 'now') WHERE id = ? AND id > ?",
+            (int(completed), task_id, self.floor())
+        )
+        if not self.cursor.rowcount:
+            return False
+        self.log_change('update', task_id)
+        return True
+
+    def archive_completed(self, older_than, limit=5000):
+        # Moves up to limit tasks completed more than older_than seconds ago
+        # to tasks_archive and returns their ids. Callers repeat until fewer
+        # than limit come back, so no single transaction holds the write
+        # lock for long. The batch goes through a temp table because one
+        # set-based DELETE is ~20x faster than per-row deletes here, most of
+        # the difference being the full-text index's delete trigger.
+        cutoff = int(time.time()) - older_than
+        self.cursor.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)')
+        self.cursor.execute('DELETE FROM archive_batch')
+        self.cursor.execute(
+            'INSERT INTO archive_batch SELECT id FROM tasks WHERE completed = 1 AND updated_at < ? AND id > ? LIMIT ?',
+            (cutoff, self.floor(), limit)
+        )
+        ids = [row[0] for row in self.cursor.execute('SELECT id FROM archive_batch')]
+        if ids:
+            self.cursor.execute(
+                '''INSERT INTO tasks_archive (id, title, created_at, updated_at)
+                   SELECT id, title, created_at, updated_at FROM tasks WHERE id IN archive_batch'''
+            )
+            self.cursor.execute('DELETE FROM tasks WHERE id IN archive_batch')
+            self.cursor.execute(
+                "INSERT INTO task_changes (op, task_id, source) SELECT 'delete', id, ? FROM archive_batch",
+                (self.source,)
+            )
+            self.written(len(ids))
+        return ids
 
     def delete_all_tasks(self):
-        self.cursor.execute('DELETE FROM tasks')
+        # Hides every task by raising the floor past the newest id, so it
+        # costs the same for ten tasks or a million and can be undone
+        floor = self.floor()
+        last_id = self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tasks').fetchone()[0]
+        if last_id > floor:
+            self.set_meta('floor_id', last_id)
+            self.log_change('clear')
+            self.record('clear', before=floor, after=last_id)
+            self.written()
+
+    def meta(self, key):
+        return self.cursor.execute('SELECT value FROM task_meta WHERE key = ?', (key,)).fetchone()[0]
+
+    def set_meta(self, key, value):
+        self.cursor.execute('UPDATE task_meta SET value = ? WHERE key = ?', (value, key))
+
+    def floor(self):
+        return self.meta('floor_id')
+
+    def claim_journal(self):
+        # Takes over the undo history left by the last instance to close,
+        # unless another instance already has
+        self.cursor.execute("UPDATE task_journal SET source = ? WHERE source = ''", (self.source,))
+        self.cursor.execute("UPDATE task_journal_cursor SET source = ? WHERE source = ''", (self.source,))
+        if not self.cursor.rowcount:
+            self.cursor.execute('INSERT INTO task_journal_cursor VALUES (?, 0)', (self.source,))
         self.conn.commit()
 
+    def release_journal(self):
+        # Leaves this instance's undo history for the next one to open, in
+        # place of any an earlier instance left unclaimed
+        for table in ('task_journal', 'task_journal_cursor'):
+            self.cursor.execute(f"DELETE FROM {table} WHERE source = ''")
+            self.cursor.execute(f"UPDATE {table} SET source = '' WHERE source = ?", (self.source,))
+
+    def journal_cursor(self):
+        return self.cursor.execute(
+            'SELECT seq FROM task_journal_cursor WHERE source = ?', (self.source,)
+        ).fetchone()[0]
+
+    def set_journal_cursor(self, seq):
+        self.cursor.execute('UPDATE task_journal_cursor SET seq = ? WHERE source = ?', (seq, self.source))
+
+    def journal_entry(self, condition, cursor):
+        return self.cursor.execute(
+            f'''SELECT seq, op, task_id, title, before, after FROM task_journal
+                WHERE source = ? AND {condition} LIMIT 1''', (self.source, cursor)
+        ).fetchone()
+
+    def record(self, op, task_id=None, title=None, before=None, after=None):
+        # A new edit drops whatever this instance could redo, and its oldest
+        # steps once there are more than JOURNAL_KEEP. Tasks hidden by a
+        # Delete All that can no longer be undone are only then deleted for
+        # real, except the one at the floor itself: new ids follow on from
+        # the highest one in the table, and must stay above the floor.
+        cursor = self.journal_cursor()
+        self.cursor.execute('DELETE FROM task_journal WHERE source = ? AND seq > ?', (self.source, cursor))
+        self.cursor.execute(
+            'INSERT INTO task_journal (op, task_id, title, before, after, source) VALUES (?, ?, ?, ?, ?, ?)',
+            (op, task_id, title, before, after, self.source)
+        )
+        self.set_journal_cursor(self.cursor.lastrowid)
+        oldest = self.cursor.execute(
+            'SELECT seq FROM task_journal WHERE source = ? ORDER BY seq DESC LIMIT 1 OFFSET ?',
+            (self.source, self.JOURNAL_KEEP)
+        ).fetchone()
+        if oldest is None:
+            return
+        floor = self.cursor.execute(
+            "SELECT MAX(after) FROM task_journal WHERE source = ? AND seq <= ? AND op = 'clear'",
+            (self.source, oldest[0])
+        ).fetchone()[0]
+        self.cursor.execute('DELETE FROM task_journal WHERE source = ? AND seq <= ?', (self.source, oldest[0]))
+        if floor is not None:
+            # Another instance undoing a Delete All of its own would show
+            # again what lies above its old floor
+            others = self.cursor.execute("SELECT MIN(before) FROM task_journal WHERE op = 'clear'").fetchone()[0]
+            self.cursor.execute('DELETE FROM tasks WHERE id < ?', (floor if others is None else min(floor, others),))
+
+    def undo(self):
+        # Reverts this instance's last applied edit. Returns its effect as
+        # changes_since rows, [('reload', ...)] when the list must be read
+        # again, or None if there is nothing to undo.
+        entry = self.journal_entry('seq <= ? ORDER BY seq DESC', self.journal_cursor())
+        if entry is None:
+            return None
+        changes = self.replay(*entry, undo=True)
+        self.set_journal_cursor(entry[0] - 1)
+        self.written()
+        return changes
+
+    def redo(self):
+        entry = self.journal_entry('seq > ? ORDER BY seq', self.journal_cursor())
+        if entry is None:
+            return None
+        changes = self.replay(*entry, undo=False)
+        self.set_journal_cursor(entry[0])
+        self.written()
+        return changes
+
+    def replay(self, seq, op, task_id, title, before, after, undo):
+        if op == 'clear':
+            floor = self.floor()
+            if undo and floor != after:
+                # Another instance has hidden more tasks since, and the old
+                # floor would show those again too. The step is dropped, so
+                # the next undo goes on to the one before it.
+                self.cursor.execute('DELETE FROM task_journal WHERE seq = ?', (seq,))
+                self.written()
+                raise ValueError('the list was cleared in another window since')
+            self.set_meta('floor_id', before if undo else max(floor, after))
+            # Undoing brings back tasks that were never sent to other
+            # instances one by one, so they reload
+            self.log_change('reload' if undo else 'clear')
+            return [('reload' if undo else 'clear', None, None, None)]
+        if op == 'complete':
+            completed = before if undo else after
+            if not self.update_row(task_id, completed):
+                return []
+            return [('update', task_id, title, completed)]
+        if (op == 'add') == undo:
+            self.remove_row(task_id)
+            return [('delete', task_id, None, None)]
+        completed = before or 0
+        new_id = self.restore_row(task_id, title, completed)
+        if new_id is None:
+            return []
+        if new_id != task_id:
+            # Later steps for this task refer to it by its new id
+            self.cursor.execute('UPDATE task_journal SET task_id = ? WHERE task_id = ?', (new_id, task_id))
+        return [('add', new_id, title, completed)]
+
+    def latest_change(self):
+        self.cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM task_changes')
+        return self.cursor.fetchone()[0]
+
+    def first_page(self, limit, completed=None):
+        # What a (re)load starts from, read in one worker call: the latest
+        # change, to replay later ones over, and the first page of tasks
+        return self.latest_change(), self.get_tasks_page(0, limit, completed)
+
+    def changes_since(self, after_seq, limit=2000):
+        # Changes other instances made after after_seq, as (seq, rows) with
+        # rows of (op, task_id, title, completed) giving each task's current
+        # state (title None once it is gone), or (seq, None) when the log no
+        # longer reaches back that far and the caller must reload.
+        # PRAGMA data_version only moves when another connection commits,
+        # so an idle poll costs no query.
+        data_version = self.cursor.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self.data_version and after_seq >= self.last_change:
+            return after_seq, []
+        self.data_version = data_version
+        oldest, latest = self.cursor.execute(
+            'SELECT COALESCE(MIN(seq), 0), COALESCE(MAX(seq), 0) FROM task_changes'
+        ).fetchone()
+        self.last_change = latest
+        if after_seq < oldest - 1:
+            return latest, None
+        self.cursor.execute(
+            '''SELECT task_changes.seq, op, task_id, tasks.title, tasks.completed
+               FROM task_changes LEFT JOIN tasks ON tasks.id = task_changes.task_id AND tasks.id > ?
+               WHERE seq > ? AND source != ? ORDER BY seq LIMIT ?''',
+            (self.floor(), after_seq, self.source, limit)
+        )
+        rows = self.cursor.fetchall()
+        seq = rows[-1][0] if len(rows) == limit else latest
+        return seq, [row[1:] for row in rows]
+
+    def has_task(self, task):
+        return self.find_task(task) is not None
+
+    def search_tasks(self, text, limit=500, candidates=2000):
+        # Every word of text must start a word of the title; best matches
+        # (bm25) first. Scoring every match of a common word costs ~150 ms
+        # at a million tasks, so only the newest candidates matches are
+        # ranked, which FTS5 reads straight off its rowid order.
+        words = re.findall(r'\w+', text)
+        if not words:
+            return []
+        query = ' '.join(f'"{word}"*' for word in words)
+        self.cursor.execute(
+            '''SELECT tasks.id, tasks.title, tasks.completed
+               FROM (SELECT rowid, bm25(tasks_fts) AS score FROM tasks_fts
+                     WHERE tasks_fts MATCH ? ORDER BY rowid DESC LIMIT ?) AS hits
+               JOIN tasks ON tasks.id = hits.rowid AND tasks.id > ?
+               ORDER BY hits.score, tasks.id DESC LIMIT ?''',
+            (query, max(candidates, limit), self.floor(), limit)
+        )
+        return self.cursor.fetchall()
+
+    def get_tasks_page(self, after_id=0, limit=1000, completed=None):
+        # Keyset pagination: the next limit tasks with id > after_id, read
+        # straight off the primary key however deep into the table it is.
+        # completed=0 or 1 reads one state through its partial index; the
+        # planner only matches those on a literal, not a bound parameter.
+        # Tasks hidden by Delete All sit below the floor, so start past it.
+        after_id = max(after_id, self.floor())
+        where = '' if completed is None else f'completed = {int(completed)} AND '
+        self.cursor.execute(
+            f'SELECT id, title, completed FROM tasks WHERE {where}id > ? ORDER BY id LIMIT ?',
+            (after_id, limit)
+        )
+        return self.cursor.fetchall()
+
     def get_tasks(self):
-        self.cursor.execute('SELECT title, completed FROM tasks')
+        self.cursor.execute('SELECT id, title, completed FROM tasks WHERE id > ? ORDER BY id', (self.floor(),))
         return self.cursor.fetchall()
 
     def close(self):
+        self.flush()
+        try:
+            self.release_journal()
+            self.conn.commit()
+        except sql.OperationalError:
+            self.conn.rollback()  # locked past the busy timeout: the history stays behind
         self.conn.close()
 
+# Background database access
+class DatabaseWorker:
+    # Runs TaskDatabase calls on one worker thread, in the order submitted.
+    # submit() returns a Future; its on_done/on_error callbacks run on the
+    # Tk thread, picked up by poll() through the scheduler (root.after).
+    # The worker commits once its queue runs dry or BATCH calls have run,
+    # and only then completes their futures, so a failed commit rolls the
+    # whole group back and reports it to every caller in it.
+    BATCH = 256
+    READS = ('get_tasks', 'get_tasks_page', 'has_task', 'search_tasks', 'latest_change', 'changes_since',
+             'find_task', 'first_page')
+    POLL_BUDGET = 0.008  # seconds of callbacks per poll, half a 60 Hz frame
+
+    def __init__(self, schedule, db_name='listOfTasks.db', db_class=TaskDatabase, poll_delay=10):
+        self.schedule = schedule
+        self.poll_delay = poll_delay
+        self.requests = queue.Queue()
+        self.completed = queue.Queue()
+        self.outstanding = 0
+        self.polling = False
+        ready = Future()
+        self.thread = threading.Thread(target=self.run, args=(db_class, db_name, ready), daemon=True)
+        self.thread.start()
+        # Opening and migrating errors are raised here, on the caller's thread
+        ready.result()
+
+    def run(self, db_class, db_name, ready):
+        try:
+            # The worker decides when to commit
+            db = db_class(db_name, batch_size=float('inf'))
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+        group = []
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            future, method, args, on_done, on_error = request
+            try:
+                result, error = getattr(db, method)(*args), None
+            except Exception as e:
+                result, error = None, e
+            group.append((future, method, result, error, on_done, on_error))
+            if len(group) >= self.BATCH or self.requests.empty():
+                self.finish(db, group)
+                group = []
+        self.finish(db, group)
+        db.close()
+
+    def finish(self, db, group):
+        try:
+            db.flush()
+            failed = None
+        except Exception as e:
+            db.conn.rollback()
+            db.pending = 0
+            failed = e
+        for future, method, result, error, on_done, on_error in group:
+            if failed is not None and error is None and method not in self.READS:
+                error = failed
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+            self.completed.put((future, on_done, on_error))
+
+    def submit(self, method, *args, on_done=None, on_error=None):
+        future = Future()
+        self.outstanding += 1
+        self.requests.put((future, method, args, on_done, on_error))
+        if not self.polling:
+            self.polling = True
+            self.schedule(self.poll_delay, self.poll)
+        return future
+
+    def call(self, method, *args):
+        # Blocking call, for the first screen in TaskManager.__init__ only:
+        # from an event loop callback it would wait behind whatever is queued
+        return self.submit(method, *args).result()
+
+    def poll(self):
+        # Runs on the Tk thread. Errors without an on_error go to Tk's
+        # callback error reporting.
+        deadline = time.perf_counter() + self.POLL_BUDGET
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    future, on_done, on_error = self.completed.get_nowait()
+                except queue.Empty:
+                    break
+                self.outstanding -= 1
+                error = future.exception()
+                if error is None:
+                    if on_done:
+                        on_done(future.result())
+                elif on_error:
+                    on_error(error)
+                else:
+                    raise error
+        finally:
+            if self.outstanding:
+                more = not self.completed.empty()
+                self.schedule(0 if more else self.poll_delay, self.poll)
+            else:
+                self.polling = False
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+# In-memory task model
+class TaskList:
+    # Tasks in display order: an insertion-ordered dict of id -> title plus a
+    # title -> id index, so membership, add and remove are all O(1).
+    # done holds the ids of completed tasks.
+    DONE_MARK = '\u2714 '
+
+    def __init__(self):
+        self.titles = {}
+        self.ids = {}
+        self.done = set()
+
+    def add(self, task_id, title, completed=False):
+        self.titles[task_id] = title
+        self.ids[title] = task_id
+        if completed:
+            self.done.add(task_id)
+
+    def remove(self, title):
+        task_id = self.ids.pop(title)
+        del self.titles[task_id]
+        self.done.discard(task_id)
+        return task_id
+
+    def rekey(self, old_id, new_id):
+        # Moves the task to the end of the order, like a fresh add
+        title = self.titles.pop(old_id)
+        self.titles[new_id] = title
+        self.ids[title] = new_id
+        if old_id in self.done:
+            self.done.remove(old_id)
+            self.done.add(new_id)
+
+    def set_completed(self, task_id, completed):
+        if completed:
+            self.done.add(task_id)
+        else:
+            self.done.discard(task_id)
+
+    def label(self, task_id):
+        # The line shown for a task: its title, ticked once completed
+        title = self.titles[task_id]
+        return self.DONE_MARK + title if task_id in self.done else title
+
+    def id_of(self, title):
+        return self.ids.get(title)
+
+    def clear(self):
+        self.titles.clear()
+        self.ids.clear()
+        self.done.clear()
+
+    def __contains__(self, title):
+        return title in self.ids
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __iter__(self):
+        return iter(self.titles.values())
+
+# Listbox view of the task model
+class ListboxView:
+    # Keeps a Listbox in step with the task model by issuing only the Tk
+    # calls each change needs. line_ids[i] is the id of the task on line i.
+    # tk_calls counts every call made, last_calls those of the last update.
+    def __init__(self, listbox):
+        self.listbox = listbox
+        self.line_ids = []
+        self.tk_calls = 0
+        self.last_calls = 0
+
+    def counted(self, calls):
+        self.last_calls = calls
+        self.tk_calls += calls
+
+    def load(self, tasks):
+        # Full reload: at most one delete and one multi-item insert
+        calls = 0
+        if self.line_ids:
+            self.listbox.delete(0, 'end')
+            calls += 1
+        self.line_ids = list(tasks.titles)
+        if self.line_ids:
+            if tasks.done:
+                self.listbox.insert('end', *map(tasks.label, self.line_ids))
+            else:
+                self.listbox.insert('end', *tasks)
+            calls += 1
+        self.counted(calls)
+
+    def extend(self, task_ids, labels):
+        if task_ids:
+            self.listbox.insert('end', *labels)
+            self.line_ids.extend(task_ids)
+            self.counted(1)
+
+    def append(self, task_id, title):
+        self.listbox.insert('end', title)
+        self.line_ids.append(task_id)
+        self.counted(1)
+
+    def insert(self, index, task_id, label):
+        index = min(index, len(self.line_ids))
+        self.listbox.insert(index, label)
+        self.line_ids.insert(index, task_id)
+        self.counted(1)
+
+    def rekey(self, old_id, new_id):
+        # Temporary ids belong to recent adds, so search from the end
+        for index in range(len(self.line_ids) - 1, -1, -1):
+            if self.line_ids[index] == old_id:
+                self.line_ids[index] = new_id
+                return
+
+    def find(self, task_id, index=None):
+        # index is a hint, e.g. from curselection(), checked before use
+        if index is None or index >= len(self.line_ids) or self.line_ids[index] != task_id:
+            index = self.line_ids.index(task_id)
+        return index
+
+    def remove(self, task_id, index=None):
+        index = self.find(task_id, index)
+        self.listbox.delete(index)
+        del self.line_ids[index]
+        self.counted(1)
+
+    def relabel(self, task_id, label, index=None):
+        # A Listbox line cannot be edited in place, only replaced
+        index = self.find(task_id, index)
+        self.listbox.delete(index)
+        self.listbox.insert(index, label)
+        self.counted(2)
+
+    def clear(self):
+        self.listbox.delete(0, 'end')
+        self.line_ids = []
+        self.counted(1)
+
 # GUI for Task Management
 class TaskManager:
-    def __init__(self, root):
-        self.db = TaskDatabase()
-        self.tasks = []
+    # Rows read before the window first paints, then per event loop turn
+    FIRST_PAGE = 50
+    PAGE_SIZE = 2000
+    # Search runs this many ms after the last keystroke
+    SEARCH_DELAY = 150
+    SEARCH_LIMIT = 500
+    # Which tasks each filter shows, as TaskDatabase's completed argument
+    FILTERS = {'All': None, 'Active': 0, 'Done': 1}
+    # Completed tasks older than this (seconds) move to the archive table
+    ARCHIVE_AFTER = 30 * 24 * 3600
+    ARCHIVE_BATCH = 5000
+    # ms between checks for changes made by other instances
+    SYNC_INTERVAL = 250
+
+    def __init__(self, root, db_name='listOfTasks.db', db_class=TaskDatabase):
+        self.root = root
+        self.worker = DatabaseWorker(root.after, db_name, db_class)
+        self.tasks = TaskList()
+        # The listbox shows either all tasks or a TaskList of search results
+        self.shown = self.tasks
+        self.search_generation = 0
+        self.status_filter = None
+        self.archive_started = False
+        self.change_seq = 0
+        self.syncing = False
+        # Tasks shown before the database has confirmed them get negative ids
+        self.temp_ids = itertools.count(-1, -1)
+        # temp id -> real id (None if the add failed) for tasks removed
+        # before their add was confirmed
+        self.confirmed_ids = {}
+        self.loading = False
+        self.load_generation = 0
+        self.last_loaded_id = 0
 
         # Window setup
         root.title("To-Do List")
-        root.geometry("665x400+550+250")
+        root.geometry("665x440+550+250")
         root.resizable(0, 0)
         root.configure(bg="#B5E5CF")
-
-        # Frame
-        self.functions_frame = Frame(root, bg="#8EE5EE")
-        self.functions_frame.pack(side="top", expand=True, fill="both")
+        # Closing the window must still commit the last group of writes
+        root.protocol("WM_DELETE_WINDOW", self.close)
 
         # Widgets
         self.create_widgets()
-        self.retrieve_database()
-        self.update_listbox()
+        self.view = ListboxView(self.task_listbox)
+        self.retrieve_database(blocking=True)
 
     def create_widgets(self):
+        # Frame
+        self.functions_frame = Frame(self.root, bg="#8EE5EE")
+        self.functions_frame.pack(side="top", expand=True, fill="both")
+
         Label(
             self.functions_frame,
             text="TO-DO-LIST \n Enter the Task Title:",
@@ -83,10 +902,53 @@ class TaskManager:
         ).place(x=460, y=80)
 
         Button(
-            self.functions_frame, text="Exit / Close", width=52,
+            self.functions_frame, text="Done / Not Done", width=15,
+            bg='#D4AC0D', font=("arial", "14", "bold"),
+            command=self.toggle_task
+        ).place(x=18, y=370)
+
+        Button(
+            self.functions_frame, text="Undo", width=7,
+            bg='#D4AC0D', font=("arial", "14", "bold"),
+            command=self.undo
+        ).place(x=240, y=370)
+
+        Button(
+            self.functions_frame, text="Redo", width=7,
+            bg='#D4AC0D', font=("arial", "14", "bold"),
+            command=self.redo
+        ).place(x=350, y=370)
+
+        Button(
+            self.functions_frame, text="Exit / Close", width=15,
             bg='#D4AC0D', font=("arial", "14", "bold"),
             command=self.close
-        ).place(x=17, y=330)
+        ).place(x=460, y=370)
+
+        self.root.bind('<Control-z>', lambda event: self.undo())
+        self.root.bind('<Control-y>', lambda event: self.redo())
+
+        Label(
+            self.functions_frame, text="Search:",
+            font=("arial", "14", "bold"),
+            bg="#8EE5EE", fg="#FF6103"
+        ).place(x=20, y=135)
+
+        self.search_field = Entry(
+            self.functions_frame,
+            font=("Arial", "14"),
+            width=20, fg="black", bg="white"
+        )
+        self.search_field.place(x=180, y=135)
+        self.search_field.bind('<KeyRelease>', self.search_changed)
+
+        self.filter_var = StringVar(value='All')
+        for offset, name in enumerate(self.FILTERS):
+            Radiobutton(
+                self.functions_frame, text=name, value=name,
+                variable=self.filter_var, command=self.filter_changed,
+                font=("arial", "12", "bold"), bg="#8EE5EE"
+            ).place(x=420 + offset * 78, y=135)
 
         self.task_listbox = Listbox(
             self.functions_frame, width=70, height=9,
@@ -94,7 +956,7 @@ class TaskManager:
             bg="WHITE", fg="BLACK",
             selectbackground="#FF8C00", selectforeground="BLACK"
         )
-        self.task_listbox.place(x=17, y=140)
+        self.task_listbox.place(x=17, y=175)
 
     def add_task(self):
         task = self.task_field.get().strip()
@@ -105,41 +967,373 @@ class TaskManager:
         if task in self.tasks:
             messagebox.showinfo('Error', 'Task already exists.')
             return
-
-        self.tasks.append(task)
-        self.db.add_task(task)
-        self.update_listbox()
         self.task_field.delete(0, 'end')
+        self.end_search()
+
+        # While pages are still streaming in, the new row (the highest id)
+        # arrives with the last page, in order. The Done filter does not
+        # show new tasks at all.
+        if self.loading or self.status_filter == 1:
+            generation = self.load_generation
+            self.worker.submit(
+                'add_task', task,
+                on_done=lambda task_id: self.added_in_background(generation, task, task_id),
+                on_error=lambda error: self.save_failed(task, error)
+            )
+            return
+
+        # Optimistic: show the task now, swap in its real id or roll it back
+        # when the worker answers
+        temp_id = next(self.temp_ids)
+        self.tasks.add(temp_id, task)
+        self.view.append(temp_id, task)
+        self.worker.submit(
+            'add_task', task,
+            on_done=lambda task_id: self.task_added(temp_id, task, task_id),
+            on_error=lambda error: self.task_added(temp_id, task, None, error)
+        )
+
+    def task_added(self, temp_id, task, task_id, error=None):
+        if self.tasks.titles.get(temp_id) != task:
+            # Removed again before the add was confirmed; the delete is
+            # still queued behind it and may need the real id to roll back
+            self.confirmed_ids[temp_id] = task_id
+            return
+        if task_id is None:
+            self.tasks.remove(task)
+            if self.shown is self.tasks:
+                self.view.remove(temp_id)
+            self.save_failed(task, error)
+        else:
+            self.tasks.rekey(temp_id, task_id)
+            self.view.rekey(temp_id, task_id)
+
+    def added_in_background(self, generation, task, task_id):
+        if task_id is None:
+            self.save_failed(task)
+        elif (not self.loading and generation == self.load_generation
+                and self.status_filter != 1 and task not in self.tasks):
+            # The last page was read before this insert ran
+            self.tasks.add(task_id, task)
+            if self.shown is self.tasks:
+                self.view.append(task_id, task)
+
+    def save_failed(self, task, error=None):
+        if error is None:
+            messagebox.showinfo('Error', 'Task already exists.')
+        else:
+            messagebox.showerror('Error', f'Could not save "{task}": {error}')
 
     def delete_task(self):
-        try:
-            selected_task = self.task_listbox.get(self.task_listbox.curselection())
-            if selected_task in self.tasks:
-                self.tasks.remove(selected_task)
-                self.db.delete_task(selected_task)
-                self.update_listbox()
-        except:
+        selection = self.task_listbox.curselection()
+        if not selection:
             messagebox.showinfo('Error', 'No Task Selected. Cannot Delete.')
+            return
+        index = selection[0]
+        shown = self.shown
+        task_id = self.view.line_ids[index]
+        selected_task = shown.titles[task_id]
+        completed = task_id in shown.done
+        # A search result may not be among the tasks loaded so far
+        loaded = selected_task in self.tasks
+        if loaded:
+            self.tasks.remove(selected_task)
+        if shown is not self.tasks:
+            shown.remove(selected_task)
+        self.view.remove(task_id, index)
+        self.worker.submit(
+            'delete_task', selected_task,
+            on_done=lambda result: self.confirmed_ids.pop(task_id, None),
+            on_error=lambda error: self.delete_failed(
+                index, task_id, selected_task, completed, shown, loaded, error
+            )
+        )
+
+    def delete_failed(self, index, task_id, task, completed, shown, loaded, error):
+        task_id = self.confirmed_ids.pop(task_id, task_id)
+        if task_id is not None:
+            if loaded and task not in self.tasks:
+                self.tasks.add(task_id, task, completed)
+            if shown is not self.tasks and task not in shown:
+                shown.add(task_id, task, completed)
+            if shown is self.shown:
+                self.view.insert(index, task_id, shown.label(task_id))
+        messagebox.showerror('Error', f'Could not delete "{task}": {error}')
+
+    def toggle_task(self):
+        selection = self.task_listbox.curselection()
+        if not selection:
+            messagebox.showinfo('Error', 'No Task Selected.')
+            return
+        index = selection[0]
+        task_id = self.view.line_ids[index]
+        task = self.shown.titles[task_id]
+        completed = task_id not in self.shown.done
+        if task in self.tasks:
+            if self.status_filter is None:
+                self.tasks.set_completed(self.tasks.id_of(task), completed)
+            else:
+                # It no longer belongs to the filtered list
+                self.tasks.remove(task)
+        if self.shown is not self.tasks:
+            self.shown.set_completed(task_id, completed)
+        if task_id in self.shown.titles:
+            self.view.relabel(task_id, self.shown.label(task_id), index)
+            self.task_listbox.selection_set(index)
+        else:
+            self.view.remove(task_id, index)
+        self.worker.submit(
+            'set_completed', task, completed,
+            on_error=lambda error: self.toggle_failed(task, error)
+        )
+
+    def toggle_failed(self, task, error):
+        messagebox.showerror('Error', f'Could not update "{task}": {error}')
+        self.end_search()
+        self.retrieve_database()
+
+    def filter_changed(self):
+        status_filter = self.FILTERS[self.filter_var.get()]
+        if status_filter != self.status_filter:
+            self.status_filter = status_filter
+            self.end_search()
+            self.retrieve_database()
 
     def delete_all_tasks(self):
         if messagebox.askyesno('Delete All', 'Are you sure?'):
+            self.loading = False
+            self.load_generation += 1
+            self.end_search()
             self.tasks.clear()
-            self.db.delete_all_tasks()
+            self.view.clear()
+            self.worker.submit('delete_all_tasks', on_error=self.delete_all_failed)
+
+    def delete_all_failed(self, error):
+        messagebox.showerror('Error', f'Could not delete the tasks: {error}')
+        self.retrieve_database()
+
+    def undo(self):
+        self.worker.submit('undo', on_done=self.journal_replayed, on_error=self.journal_failed)
+
+    def redo(self):
+        self.worker.submit('redo', on_done=self.journal_replayed, on_error=self.journal_failed)
+
+    def journal_replayed(self, changes):
+        # Nothing to undo or redo
+        if not changes:
+            return
+        if changes[0][0] == 'reload':
+            self.end_search()
+            self.retrieve_database()
+            return
+        for op, task_id, task, completed in changes:
+            self.apply_change(op, task_id, task, completed)
+        if self.shown is not self.tasks:
+            self.run_search(self.search_generation)
+
+    def journal_failed(self, error):
+        messagebox.showerror('Error', f'Could not undo or redo: {error}')
+        self.retrieve_database()
+
+    def search_changed(self, event=None):
+        self.search_generation += 1
+        generation = self.search_generation
+        self.root.after(self.SEARCH_DELAY, lambda: self.run_search(generation))
+
+    def run_search(self, generation):
+        if generation != self.search_generation:
+            return  # superseded by a later keystroke
+        text = self.search_field.get().strip()
+        if not text:
+            self.end_search()
+            return
+        # Only the matching page of rows comes back from the database
+        self.worker.submit(
+            'search_tasks', text, self.SEARCH_LIMIT,
+            on_done=lambda rows: self.show_results(generation, rows),
+            on_error=lambda error: messagebox.showerror('Error', f'Search failed: {error}')
+        )
+
+    def show_results(self, generation, rows):
+        if generation != self.search_generation:
+            return
+        results = TaskList()
+        for task_id, task, completed in rows:
+            results.add(task_id, task, completed)
+        self.shown = results
+        self.update_listbox()
+
+    def end_search(self):
+        self.search_generation += 1
+        self.search_field.delete(0, 'end')
+        if self.shown is not self.tasks:
+            self.shown = self.tasks
             self.update_listbox()
 
     def update_listbox(self):
-        self.task_listbox.delete(0, 'end')
-        for task in self.tasks:
-            self.task_listbox.insert('end', task)
+        self.view.load(self.shown)
 
-    def retrieve_database(self):
+    def retrieve_database(self, blocking=False):
+        # Only the first screen of tasks is read before the window paints;
+        # the rest streams in from the event loop one page at a time, so
+        # time to first paint does not grow with the table. Only startup
+        # waits for that first screen; a reload from a callback queues its
+        # read on the worker and the list stays empty, in the loading state
+        # adds and synced changes already handle, until the rows arrive.
+        start = time.perf_counter()
+        self.load_generation += 1
+        generation = self.load_generation
         self.tasks.clear()
-        for task, completed in self.db.get_tasks():
-            self.tasks.append(task)
+        self.loading = True
+        self.last_loaded_id = 0
+        if blocking:
+            result = self.worker.call('first_page', self.FIRST_PAGE, self.status_filter)
+            self.first_page_loaded(generation, start, result)
+            return
+        if self.shown is self.tasks:
+            self.update_listbox()
+        self.worker.submit(
+            'first_page', self.FIRST_PAGE, self.status_filter,
+            on_done=lambda result: self.first_page_loaded(generation, start, result),
+            on_error=lambda error: self.page_failed(generation, error)
+        )
+
+    def first_page_loaded(self, generation, start, result):
+        if generation != self.load_generation:
+            return
+        # Changes logged from here on are replayed over what is loaded
+        self.change_seq, rows = result
+        self.load_rows(rows)
+        self.update_listbox()
+        self.root.update_idletasks()
+        self.first_paint_ms = (time.perf_counter() - start) * 1000
+        self.loading = len(rows) == self.FIRST_PAGE
+        if self.loading:
+            self.load_next_page()
+        else:
+            self.load_finished()
+        if not self.syncing:
+            self.syncing = True
+            self.root.after(self.SYNC_INTERVAL, self.poll_changes)
+
+    def load_rows(self, rows):
+        for task_id, task, completed in rows:
+            self.tasks.add(task_id, task, completed)
+        if rows:
+            self.last_loaded_id = rows[-1][0]
+
+    def load_next_page(self):
+        generation = self.load_generation
+        self.worker.submit(
+            'get_tasks_page', self.last_loaded_id, self.PAGE_SIZE, self.status_filter,
+            on_done=lambda rows: self.page_loaded(generation, rows),
+            on_error=lambda error: self.page_failed(generation, error)
+        )
+
+    def page_loaded(self, generation, rows):
+        if not self.loading or generation != self.load_generation:
+            return
+        self.load_rows(rows)
+        if self.shown is self.tasks:
+            task_ids = [row[0] for row in rows]
+            self.view.extend(task_ids, [self.tasks.label(task_id) for task_id in task_ids])
+        if len(rows) == self.PAGE_SIZE:
+            self.load_next_page()
+        else:
+            self.loading = False
+            self.load_finished()
+
+    def page_failed(self, generation, error):
+        if self.loading and generation == self.load_generation:
+            self.loading = False
+            messagebox.showerror('Error', f'Could not load all tasks: {error}')
+
+    def load_finished(self):
+        self.root.title(f"To-Do List ({len(self.tasks)} tasks, first paint {self.first_paint_ms:.0f} ms)")
+        if not self.archive_started:
+            self.archive_started = True
+            self.archive_old_tasks()
+
+    def archive_old_tasks(self):
+        # Background compaction, one batch per worker call so user actions
+        # queue behind at most one batch. A failure is left for next start.
+        self.worker.submit(
+            'archive_completed', self.ARCHIVE_AFTER, self.ARCHIVE_BATCH,
+            on_done=self.tasks_archived, on_error=lambda error: None
+        )
+
+    def tasks_archived(self, task_ids):
+        removed = False
+        for task_id in task_ids:
+            task = self.tasks.titles.get(task_id)
+            if task is not None:
+                self.tasks.remove(task)
+                removed = True
+        if removed and self.shown is self.tasks:
+            self.update_listbox()
+        if len(task_ids) == self.ARCHIVE_BATCH:
+            self.archive_old_tasks()
+
+    def poll_changes(self):
+        self.worker.submit(
+            'changes_since', self.change_seq,
+            on_done=self.changes_received,
+            # e.g. locked for longer than the busy timeout: try again later
+            on_error=lambda error: self.root.after(self.SYNC_INTERVAL, self.poll_changes)
+        )
+
+    def changes_received(self, result):
+        seq, changes = result
+        if changes is None or any(change[0] == 'reload' for change in changes):
+            # Too far behind the change log to catch up from it, or another
+            # instance undid a Delete All
+            self.retrieve_database()
+        else:
+            self.change_seq = seq
+            for op, task_id, task, completed in changes:
+                self.apply_change(op, task_id, task, completed)
+        # Keep draining while another instance is busy
+        self.root.after(1 if changes else self.SYNC_INTERVAL, self.poll_changes)
+
+    def apply_change(self, op, task_id, task, completed):
+        # Bring one task in line with the database. task and completed are
+        # its current state, task None if it no longer exists.
+        showing_all = self.shown is self.tasks
+        if op == 'clear':
+            self.tasks.clear()
+            if showing_all:
+                self.view.clear()
+            return
+        known = task_id in self.tasks.titles
+        wanted = task is not None and self.status_filter in (None, completed)
+        if known and not wanted:
+            self.tasks.remove(self.tasks.titles[task_id])
+            if showing_all:
+                self.view.remove(task_id)
+        elif known:
+            if (task_id in self.tasks.done) != bool(completed):
+                self.tasks.set_completed(task_id, completed)
+                if showing_all:
+                    self.view.relabel(task_id, self.tasks.label(task_id))
+        elif wanted:
+            if self.loading and task_id > self.last_loaded_id:
+                return  # a later page brings it
+            if task in self.tasks:
+                # Added here too, and the other instance's insert won: adopt
+                # its row in place of ours, which will come back a duplicate
+                temp_id = self.tasks.id_of(task)
+                if temp_id < 0:
+                    self.tasks.rekey(temp_id, task_id)
+                    self.tasks.set_completed(task_id, completed)
+                    self.view.rekey(temp_id, task_id)
+                return
+            self.tasks.add(task_id, task, completed)
+            if showing_all:
+                self.view.append(task_id, self.tasks.label(task_id))
 
     def close(self):
-        self.db.close()
-        guiWindow.destroy()
+        self.worker.close()
+        self.root.destroy()
 
 if __name__ == "__main__":
     guiWindow = Tk()
@@ -0,0 +1,268 @@
+# Benchmarks for the calculator engine (calculator_engine.py) against the
+# eval() it replaces. Nothing here needs a display.
+#
+#     python calculator_bench.py
+#     python calculator_bench.py --terms 10 1000 100000
+#     python calculator_bench.py --only live --terms 100 1000 10000
+#     python calculator_bench.py --only backends
+#     python calculator_bench.py --only batch --rows 10000000
+#     python calculator_bench.py --only pool
+import argparse
+import decimal
+import io
+import math
+import os
+import random
+import time
+from fractions import Fraction
+
+import calculator_cli
+from calculator_engine import (
+    BACKENDS, FLOAT, EvaluationPool, ExpressionError, LiveEvaluator, ResultTooLarge, check_size,
+    compile_expression, evaluate, format_number, numpy,
+)
+
+
+SHORT = ["12+34*5", "7/3-2**3", "-4.5*2//3", "9*-2**-1"]
+
+
+def long_expression(terms, seed=0):
+    # The kind of chained calculation that gets pasted in
+    rng = random.Random(seed)
+    operators = ["+", "-", "*", "/"]
+    parts = [str(rng.randint(1, 99))]
+    for _ in range(terms - 1):
+        parts.append(rng.choice(operators))
+        parts.append(str(rng.randint(1, 99)) if rng.random() < 0.8 else f"{rng.randint(1, 99)}.{rng.randint(0, 9)}")
+    return "".join(parts)
+
+
+def per_call(func, budget=0.2):
+    # Seconds per call, repeating until the budget is spent
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / calls
+
+
+def cold(text):
+    compile_expression.cache_clear()
+    return evaluate(text)
+
+
+def bench(label, text):
+    try:
+        expected = eval(text)
+        baseline = f"{per_call(lambda: eval(text)) * 1e6:>10.1f}"
+    except RecursionError:
+        expected = None
+        baseline = f"{'fails':>10}"
+    result = evaluate(text)
+    same = expected is None or result == expected
+    uncached = per_call(lambda: cold(text))
+    cached = per_call(lambda: evaluate(text))
+    print(f"  {label:<16} {baseline} {uncached * 1e6:>12.1f} {cached * 1e6:>10.1f}  {'same' if same else 'DIFFERS'}")
+    return same
+
+
+def reparse_preview(prefix):
+    # What a preview costs without LiveEvaluator: parse the whole text again
+    try:
+        return evaluate(prefix.rstrip("+-*/"))
+    except (ExpressionError, ArithmeticError):
+        return None
+
+
+def bench_live(terms, samples=200):
+    # Per keypress cost of a live preview while typing a long expression
+    # one character at a time. Re-parsing is timed on evenly spaced
+    # prefixes only, as doing it for every key is quadratic.
+    text = long_expression(terms)
+    live = LiveEvaluator()
+    start = time.perf_counter()
+    for char in text:
+        live.feed(char)
+        live.preview()
+    incremental = (time.perf_counter() - start) / len(text)
+    same = live.result() == evaluate(text)
+    prefixes = [text[:len(text) * (i + 1) // samples] for i in range(samples)]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        compile_expression.cache_clear()
+        reparse_preview(prefix)
+    reparse = (time.perf_counter() - start) / samples
+    print(f"  {terms:>8} {len(text):>8} {reparse * 1e6:>12.1f} {incremental * 1e6:>12.2f}  {'same' if same else 'DIFFERS'}")
+    return same
+
+
+def expression_classes():
+    primes = [n for n in range(2, 1300) if all(n % d for d in range(2, math.isqrt(n) + 1))][:200]
+    return {
+        "short": "12+34*5-6/7",
+        "decimals": "0.1+0.2*3.75-1.25/0.3",
+        "chain 1000": long_expression(1000),
+        "200 divisions": "1/" + "/".join(map(str, primes)),
+        "big power": "7**20000*3+1",
+    }
+
+
+def result_bits(value):
+    # Size of the result as stored
+    if isinstance(value, int):
+        return value.bit_length()
+    if isinstance(value, Fraction):
+        return abs(value.numerator).bit_length() + value.denominator.bit_length()
+    if isinstance(value, decimal.Decimal):
+        return round(len(value.as_tuple().digits) * math.log2(10))
+    return 64
+
+
+def bench_backends():
+    # Throughput (evaluations per second, result formatted for display) and
+    # result size per backend and kind of expression
+    names = list(BACKENDS)
+    print(f"  {'expression':<14}" + "".join(f" {name + ' evals/s':>17} {'bits':>7}" for name in names))
+    for label, text in expression_classes().items():
+        row = f"  {label:<14}"
+        for name in names:
+            backend = BACKENDS[name]
+            value = evaluate(text, backend)
+            rate = 1 / per_call(lambda: format_number(evaluate(text, backend)))
+            row += f" {rate:>17,.0f} {result_bits(value):>7}"
+        print(row)
+
+
+def bench_batch(rows, sample=20_000):
+    # Rows of a*b+c through the command line tool's run(), output thrown
+    # away, against eval() and the engine one row at a time on a sample.
+    # Reading the numbers out of the text is most of the cost; the last
+    # line times the arithmetic alone, over columns already parsed.
+    rng = random.Random(2)
+    columns = [[rng.randint(0, 99999) for _ in range(rows)] for _ in range(3)]
+    lines = [f"{a}*{b}+{c}\n" for a, b, c in zip(*columns)]
+    head = [line.strip() for line in lines[:sample]]
+    start = time.perf_counter()
+    expected = [eval(text) for text in head]
+    eval_rate = sample / (time.perf_counter() - start)
+    start = time.perf_counter()
+    same = [evaluate(text) for text in head] == expected
+    row_rate = sample / (time.perf_counter() - start)
+    print(f"{rows} rows of a*b+c, NumPy {'installed' if numpy is not None else 'not installed'}")
+    print(f"  {'eval() per row':<24} {eval_rate:>12,.0f} rows/s")
+    print(f"  {'engine per row':<24} {row_rate:>12,.0f} rows/s {row_rate / eval_rate:>8.1f}x")
+    for label, vector in (("by shape, lists", False), ("by shape, NumPy", True)):
+        if vector and numpy is None:
+            continue
+        with open(os.devnull, "w") as out:
+            start = time.perf_counter()
+            calculator_cli.run(iter(lines), out, FLOAT, vector)
+            rate = rows / (time.perf_counter() - start)
+        same = same and calculator_cli.evaluate_many(head, FLOAT, vector) == expected
+        print(f"  {label:<24} {rate:>12,.0f} rows/s {rate / eval_rate:>8.1f}x")
+    program = compile_expression(head[0])
+    vector = numpy is not None
+    if vector:
+        columns = [numpy.array(column) for column in columns]
+    start = time.perf_counter()
+    program.run_columns(columns, vector)
+    rate = rows / (time.perf_counter() - start)
+    print(f"  {'arithmetic alone':<24} {rate:>12,.0f} rows/s {rate / eval_rate:>8.1f}x")
+    return same and bad_lines_kept()
+
+
+def bad_lines_kept():
+    # A line that cannot be worked out (# included, as # stands for a
+    # number in the shapes) gives its own error: line and nothing else
+    lines = ["2*3\n", "1#2\n", "4*5\n", "#\n", "3*3\n", "1/0\n", "7-8\n"]
+    out = io.StringIO()
+    calculator_cli.run(iter(lines), out, FLOAT)
+    got = out.getvalue().splitlines()
+    expected = ["6", "error: Unexpected '#'", "20", "error: Unexpected '#'", "9", "error: division by zero", "-1"]
+    if got != expected:
+        print(f"  bad lines: got {got}")
+    return got == expected
+
+
+def wait(pool, job):
+    while True:
+        for finished, value, error in pool.poll():
+            if finished == job:
+                return value, error
+        time.sleep(0.001)
+
+
+def bench_pool():
+    # What = costs for inputs the live evaluator leaves alone: the size
+    # check that refuses towers up front, a big power worked out in this
+    # process against in a worker, and how soon a running worker stops
+    # once cancelled (Clear), the window having stayed free all along.
+    same = True
+    for text in ["9**9**9", "2**2**2**2**2**2", "99**99**9", "3**30000000"]:
+        program = compile_expression(text)
+
+        def refuse():
+            try:
+                check_size(program)
+            except ResultTooLarge as e:
+                return str(e)
+
+        reason = refuse()
+        print(f"  {text:<18} refused in {per_call(refuse) * 1e6:>8.1f} us  {reason}")
+        same = same and reason is not None
+    pool = EvaluationPool(workers=2, timeout=120, seconds=120)
+    try:
+        same = wait(pool, pool.submit("1+1")) == (2, None) and same
+        text = "7**200000+1"
+        start = time.perf_counter()
+        expected = evaluate(text)
+        direct = time.perf_counter() - start
+        start = time.perf_counter()
+        value, error = wait(pool, pool.submit(text))
+        pooled = time.perf_counter() - start
+        same = same and error is None and value == expected
+        print(f"  {text:<18} {direct * 1e3:>8.1f} ms here {pooled * 1e3:>8.1f} ms in a worker")
+        job = pool.submit("3**20000000")
+        time.sleep(0.5)
+        start = time.perf_counter()
+        pool.cancel(job)
+        print(f"  {'3**20000000':<18} cancelled after 0.5 s, stopped in {(time.perf_counter() - start) * 1e3:.1f} ms")
+        start = time.perf_counter()
+        value, error = wait(pool, pool.submit("2+2"))
+        same = same and value == 4
+        print(f"  {'2+2':<18} right after, on the other worker {(time.perf_counter() - start) * 1e3:.1f} ms")
+    finally:
+        pool.close()
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculator engine benchmarks")
+    parser.add_argument("--terms", type=int, nargs="+", default=[10, 100, 1000, 10_000],
+                        help="numbers in each long expression")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in the batch run")
+    parser.add_argument("--only", choices=["eval", "live", "backends", "batch", "pool"])
+    args = parser.parse_args()
+    same = True
+    if args.only in (None, "eval"):
+        print(f"  {'expression':<16} {'eval us':>10} {'compile us':>12} {'cached us':>10}")
+        same = all([bench(text, text) for text in SHORT])
+        same = all([bench(f"{terms} terms", long_expression(terms)) for terms in args.terms]) and same
+    if args.only in (None, "live"):
+        print(f"  {'terms':>8} {'keys':>8} {'reparse us':>12} {'live us':>12}   per keypress")
+        same = all([bench_live(terms) for terms in args.terms]) and same
+    if args.only in (None, "backends"):
+        bench_backends()
+    if args.only in (None, "batch"):
+        same = bench_batch(args.rows) and same
+    if args.only in (None, "pool"):
+        same = bench_pool() and same
+    if not same:
+        raise SystemExit("results differ")
+
+
+if __name__ == "__main__":
+    main()
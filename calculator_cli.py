@@ -0,0 +1,61 @@
+# Headless calculator: reads one expression per line from the files given
+# (or stdin) and writes one result per line, "error: ..." for a line that
+# cannot be worked out. Nothing here needs a display.
+#
+#     python calculator_cli.py expressions.txt > results.txt
+#     python calculator_cli.py --backend decimal --precision 50 < expressions.txt
+import argparse
+import fileinput
+import sys
+from itertools import islice
+
+from calculator_engine import EXACT_BITS, BACKENDS, decimal_backend, evaluate_many, format_number
+
+
+# Lines evaluated together; rows of one shape within a chunk share a
+# compiled program and run as columns
+CHUNK = 100_000
+
+
+def format_result(value):
+    if isinstance(value, Exception):
+        return f"error: {value}"
+    return format_number(value)
+
+
+def format_results(values):
+    # str() straight over a chunk of plain floats or short ints, which is
+    # what a chunk of one shape usually is
+    kinds = set(map(type, values))
+    if kinds == {float} or kinds == {int} and max(max(values), -min(values)).bit_length() <= EXACT_BITS:
+        return map(str, values)
+    return map(format_result, values)
+
+
+def run(lines, out, backend, vector=True, chunk=CHUNK):
+    # Returns the number of lines evaluated
+    count = 0
+    while True:
+        batch = [line.rstrip("\r\n") for line in islice(lines, chunk)]
+        if not batch:
+            return count
+        out.write("\n".join(format_results(evaluate_many(batch, backend, vector))))
+        out.write("\n")
+        count += len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate calculator expressions, one per line")
+    parser.add_argument("files", nargs="*", help="files to read, stdin if none or -")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="float")
+    parser.add_argument("--precision", type=int, default=28, help="digits for the decimal backend")
+    parser.add_argument("--no-vector", action="store_true", help="never use NumPy, even if installed")
+    parser.add_argument("--chunk", type=int, default=CHUNK)
+    args = parser.parse_args()
+    backend = decimal_backend(args.precision) if args.backend == "decimal" else BACKENDS[args.backend]
+    with fileinput.input(args.files) as lines:
+        run(lines, sys.stdout, backend, not args.no_vector, args.chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,888 @@
+import decimal
+import math
+import multiprocessing
+import operator
+import re
+import signal
+import time
+import warnings
+from collections import deque
+from contextlib import nullcontext
+from fractions import Fraction
+from functools import lru_cache
+from itertools import accumulate, count
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import resource
+except ImportError:  # Windows: workers run without CPU and memory limits
+    resource = None
+
+
+# Headless arithmetic for the calculator in "GUI-based simple calculator
+# using the Python.py": a tokenizer, a shunting-yard compiler to RPN
+# bytecode and a small stack machine that runs it. Only what the buttons
+# can type is accepted: numbers, + - * / and the ** and // that pressing
+# * or / twice gives, with + and - also usable as signs. Nothing goes
+# through eval(), and with the default float backend results are the ones
+# Python gives for the same text; the decimal and fraction backends run
+# the same code over decimal.Decimal or fractions.Fraction numbers.
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+class ResultTooLarge(ExpressionError):
+    pass
+
+
+class EvaluationStopped(Exception):
+    # A worker was stopped before it finished: out of time, or killed for
+    # going over its CPU limit
+    pass
+
+
+# A number, an operator, or any other non-blank character, which is an error
+TOKEN = re.compile(r"(\d+\.?\d*|\.\d+)|(\*\*|//|[-+*/])|(\S)")
+NUMBER = re.compile(r"(\d+\.?\d*|\.\d+)")
+
+# Binding power of each binary operator. Signs bind tighter than * and /
+# but looser than a ** to their right, so -2**2 is -4 as in Python.
+BINARY = {
+    "+": (10, operator.add),
+    "-": (10, operator.sub),
+    "*": (20, operator.mul),
+    "/": (20, operator.truediv),
+    "//": (20, operator.floordiv),
+    "**": (40, operator.pow),
+}
+RIGHT_ASSOCIATIVE = {"**"}
+SIGNS = {"+": operator.pos, "-": operator.neg}
+SIGN_POWER = 30
+
+# Bytecode instructions are (PUSH, index into the literals) or
+# (UNARY or BINARY, the operator function)
+PUSH, UNARY, BINARY_OP = range(3)
+
+
+def tokenize(text):
+    # Yields (number, operator) pairs with one of the two set
+    for number, symbol, other in TOKEN.findall(text):
+        if other:
+            raise ExpressionError(f"Unexpected {other!r}")
+        yield number or None, symbol
+
+
+def compile_tokens(tokens):
+    # Shunting-yard: numbers go straight to the code, operators wait on a
+    # stack until one that binds less tightly arrives. Iterative, so
+    # expressions too long for eval() (a few thousand terms) still compile.
+    code = []
+    literals = []
+    waiting = []  # (binding power, instruction)
+    expect_number = True
+    for number, symbol in tokens:
+        if number is not None:
+            if not expect_number:
+                raise ExpressionError(f"Missing operator before {number}")
+            code.append((PUSH, len(literals)))
+            literals.append(number)
+            expect_number = False
+        elif expect_number:
+            if symbol not in SIGNS:
+                raise ExpressionError(f"Missing number before {symbol}")
+            # A sign applies to what follows, so it never pops anything
+            waiting.append((SIGN_POWER, (UNARY, SIGNS[symbol])))
+        else:
+            power, function = BINARY[symbol]
+            if symbol in RIGHT_ASSOCIATIVE:
+                while waiting and waiting[-1][0] > power:
+                    code.append(waiting.pop()[1])
+            else:
+                while waiting and waiting[-1][0] >= power:
+                    code.append(waiting.pop()[1])
+            waiting.append((power, (BINARY_OP, function)))
+            expect_number = True
+    if expect_number:
+        raise ExpressionError("Missing number at the end" if literals else "Empty expression")
+    while waiting:
+        code.append(waiting.pop()[1])
+    return code, literals
+
+
+def parse_number(text):
+    return float(text) if "." in text else int(text)
+
+
+class Program:
+    # A compiled expression. The literals stay text next to their parsed
+    # values, so the same code can run over numbers read another way.
+    __slots__ = ("code", "literals", "values")
+
+    def __init__(self, code, literals):
+        self.code = tuple(code)
+        self.literals = tuple(literals)
+        self.values = tuple(parse_number(text) for text in literals)
+
+    def run(self, values=None):
+        if values is None:
+            values = self.values
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for opcode, argument in self.code:
+            if opcode == PUSH:
+                push(values[argument])
+            elif opcode == BINARY_OP:
+                right = pop()
+                stack[-1] = argument(stack[-1], right)
+            else:
+                stack[-1] = argument(stack[-1])
+        return stack[0]
+
+    def run_columns(self, columns, vector=False):
+        # The same code over whole columns of values, one per literal: lists
+        # combined element by element, or NumPy arrays when vector is set.
+        # Returns the result column and, for arrays, a mask of the rows that
+        # divided by zero, which the caller must work out one at a time.
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        zero_division = None
+        for opcode, argument in self.code:
+            if opcode == PUSH:
+                push(columns[argument])
+            elif opcode == UNARY:
+                stack[-1] = argument(stack[-1]) if vector else list(map(argument, stack[-1]))
+            else:
+                right = pop()
+                if not vector:
+                    stack[-1] = list(map(argument, stack[-1], right))
+                    continue
+                if argument is operator.truediv:
+                    zero = right == 0
+                    if zero.any():
+                        zero_division = zero if zero_division is None else zero_division | zero
+                        right = numpy.where(zero, 1, right)
+                stack[-1] = argument(stack[-1], right)
+        return stack[0], zero_division
+
+    def vector_safe(self, bounds):
+        # Whether NumPy int64/float64 arithmetic gives exactly what Python
+        # does, given for each literal column the largest absolute value of
+        # an int column or None for a float one: + - * / and signs only, no
+        # int result that can overflow int64, and ints below 2**53 (exact
+        # as floats) wherever they are divided
+        stack = []
+        for opcode, argument in self.code:
+            if opcode == PUSH:
+                stack.append(bounds[argument])
+            elif opcode == UNARY:
+                continue
+            elif argument not in VECTOR_OPERATIONS:
+                return False
+            else:
+                right = stack.pop()
+                left = stack[-1]
+                if left is None or right is None:
+                    if argument is operator.truediv and max(left or 0, right or 0) >= 1 << 53:
+                        return False
+                    stack[-1] = None
+                elif argument is operator.truediv:
+                    if max(left, right) >= 1 << 53:
+                        return False
+                    stack[-1] = None
+                else:
+                    bound = left * right if argument is operator.mul else left + right
+                    if bound >= 1 << 63:
+                        return False
+                    stack[-1] = bound
+        return True
+
+
+VECTOR_OPERATIONS = {operator.add, operator.sub, operator.mul, operator.truediv}
+
+
+class Backend:
+    # How numbers are read and calculated with. Operators are Python's
+    # own, so each type keeps its rules: Decimal rounds every step to the
+    # context's precision and its // truncates towards zero, Fraction is
+    # exact except that a fractional power gives a float.
+    def __init__(self, name, parse, context=None):
+        self.name = name
+        self.parse = parse
+        self.context = context
+
+    def calculating(self):
+        return nullcontext() if self.context is None else decimal.localcontext(self.context)
+
+    def run(self, program):
+        if self.parse is parse_number:
+            return program.run()
+        with self.calculating():
+            return program.run([self.parse(text) for text in program.literals])
+
+
+def decimal_backend(precision=28):
+    return Backend("decimal", decimal.Decimal, decimal.Context(prec=precision))
+
+
+# Python's int and float, exactly what eval() gave
+FLOAT = Backend("float", parse_number)
+FRACTION = Backend("fraction", Fraction)
+BACKENDS = {backend.name: backend for backend in (FLOAT, decimal_backend(), FRACTION)}
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(text):
+    # Raises ExpressionError for anything the buttons could not have typed
+    return Program(*compile_tokens(tokenize(text)))
+
+
+def evaluate(text, backend=FLOAT):
+    # Arithmetic errors (ZeroDivisionError, OverflowError, decimal's
+    # InvalidOperation) come through as raised
+    return backend.run(compile_expression(text))
+
+
+# Shapes with fewer rows than this are not worth converting to arrays
+VECTOR_ROWS = 64
+
+
+def evaluate_many(texts, backend=FLOAT, vector=True):
+    # Evaluates a list of one-line expressions, returning a list with each
+    # one's value, or the exception it raised (ExpressionError or an
+    # ArithmeticError). Rows are grouped by shape, the text with every
+    # number replaced by #, so a*b+c is compiled once for all its rows
+    # and run a column at a time: with NumPy where it is installed, vector
+    # is set and vector_safe() allows, otherwise element by element
+    # through map(). Finding the numbers and shapes is one regex pass over
+    # all the text.
+    if not texts:
+        return []
+    text = "\n".join(texts)
+    if "#" in text:
+        # # stands for a number in the shapes, so rows holding one (an
+        # error anyway) are worked out alone and kept out of the grouping
+        results = [None] * len(texts)
+        rest = []
+        for row, line in enumerate(texts):
+            if "#" in line:
+                try:
+                    results[row] = evaluate(line, backend)
+                except (ExpressionError, ArithmeticError) as e:
+                    results[row] = e
+            else:
+                rest.append(row)
+        for row, value in zip(rest, evaluate_many([texts[row] for row in rest], backend, vector)):
+            results[row] = value
+        return results
+    pieces = NUMBER.split(text)
+    literals = pieces[1::2]
+    shapes = "#".join(pieces[0::2]).split("\n")
+    if len(shapes) != len(texts):
+        raise ValueError("expressions must be single lines")
+    if len(set(shapes)) == 1:
+        return evaluate_shape(texts[0], literals, shapes[0].count("#"), len(texts), backend, vector)
+    groups = {}
+    for row, shape in enumerate(shapes):
+        rows = groups.get(shape)
+        if rows is None:
+            groups[shape] = [row]
+        else:
+            rows.append(row)
+    results = [None] * len(texts)
+    offsets = list(accumulate((shape.count("#") for shape in shapes), initial=0))
+    for shape, rows in groups.items():
+        width = shape.count("#")
+        group = [literals[offsets[row] + i] for row in rows for i in range(width)]
+        values = evaluate_shape(texts[rows[0]], group, width, len(rows), backend, vector)
+        for row, value in zip(rows, values):
+            results[row] = value
+    return results
+
+
+def evaluate_shape(text, literals, width, count, backend, vector):
+    # count rows shaped like text, their literals laid out row after row
+    try:
+        program = compile_expression(text)
+    except ExpressionError as e:
+        return [e] * count
+    columns = [literals[i::width] for i in range(width)]
+    if not any(argument is operator.pow for _, argument in program.code):
+        return run_shape(program, columns, count, backend, vector)
+    # Only a power can outgrow its text (9**9**9). A row of the largest
+    # literals is sized up first, and clears the whole group if it passes;
+    # otherwise each row is, and one too large to work out gets its
+    # ResultTooLarge in place of a value.
+    bound = largest_literals(program, columns, backend)
+    if bound is not None:
+        try:
+            check_size(Program(program.code, bound), backend)
+        except ResultTooLarge:
+            pass
+        else:
+            return run_shape(program, columns, count, backend, vector)
+    results = [None] * count
+    rows = []
+    for row, row_literals in enumerate(zip(*columns)):
+        try:
+            check_size(Program(program.code, row_literals), backend)
+        except ResultTooLarge as e:
+            results[row] = e
+        else:
+            rows.append(row)
+    if len(rows) < count:
+        columns = [[column[row] for row in rows] for column in columns]
+    for row, value in zip(rows, run_shape(program, columns, len(rows), backend, vector)):
+        results[row] = value
+    return results
+
+
+def largest_literals(program, columns, backend):
+    # The int literal of greatest magnitude in each column: with no brackets
+    # a power's base is a literal and its exponent a chain of powers, so
+    # check_size finds this row at least as large as any row of the group.
+    # A float or Decimal literal is rounded whatever its value, and one no
+    # power reads only adds its own digits, so any of those will do. None
+    # where no one row bounds the rest: zero breaks the order, as 0**0 is 1
+    # but 0**1 is 0, and 9**-0 is exact where 9**-1 is rounded; and one
+    # exact fraction cannot have both the largest numerator and denominator.
+    signed = any(opcode == UNARY for opcode, _ in program.code)
+    powered = set()
+    stack = []  # the literals of each entry that is a chain of powers
+    for opcode, argument in program.code:
+        if opcode == PUSH:
+            stack.append({argument})
+        elif opcode == BINARY_OP:
+            right = stack.pop()
+            if argument is operator.pow:
+                stack[-1] |= right
+                powered |= stack[-1]
+            else:
+                stack[-1] = set()  # never read by a power
+    bound = []
+    for i, column in enumerate(columns):
+        if i not in powered:
+            bound.append(column[0])
+            continue
+        # String searches over the whole column rather than a test per literal
+        joined = "\n" + "\n".join(column)
+        ints = column
+        if "." in joined:
+            if backend is FRACTION:
+                return None
+            ints = [text for text in column if "." not in text]
+            if not ints:
+                bound.append(column[0])
+                continue
+        if "\n0" in joined:
+            # Zeros, or leading zeros that would throw out the order by length
+            ints = [text.lstrip("0") for text in ints]
+            if signed and "" in ints:
+                return None
+        longest = max(map(len, ints))
+        if not longest:
+            return None
+        # The last text in string order is the largest number if it is one
+        # of the longest; if not, nines of that length are larger than all
+        largest = max(ints)
+        bound.append(largest if len(largest) == longest else "9" * longest)
+    return bound
+
+
+def run_shape(program, columns, count, backend, vector):
+    # The rows of one shape, given as a column of literal texts each
+    arrays = None
+    if vector and numpy is not None and count >= VECTOR_ROWS and backend is FLOAT:
+        arrays = vector_columns(columns)
+    if arrays is not None and program.vector_safe(
+            [int(numpy.abs(array).max()) if array.dtype.kind == "i" else None for array in arrays]):
+        with numpy.errstate(all="ignore"):
+            result, zero_division = program.run_columns(arrays, vector=True)
+        result = result.tolist()
+        if zero_division is not None:
+            for row in numpy.flatnonzero(zero_division).tolist():
+                result[row] = ZeroDivisionError("division by zero")
+        return result
+    if backend.parse is parse_number:
+        columns = [list(map(int if "." not in "".join(column) else parse_number, column)) for column in columns]
+    else:
+        columns = [list(map(backend.parse, column)) for column in columns]
+    try:
+        with backend.calculating():
+            result, _ = program.run_columns(columns)
+        return result
+    except ArithmeticError:
+        # Some row failed: work the group out a row at a time
+        results = []
+        for values in zip(*columns):
+            try:
+                with backend.calculating():
+                    results.append(program.run(values))
+            except ArithmeticError as e:
+                results.append(e)
+        return results
+
+
+def vector_columns(columns):
+    # Literal texts parsed by NumPy: int64 where no literal has a point,
+    # float64 where every one has, None if any column is mixed, which
+    # Python would calculate partly in ints, or too long for int64.
+    # fromstring() parses ~7x faster than int() over a list. At anything it
+    # cannot read, such as non-ASCII digits, it raises ValueError, or in
+    # older NumPy releases warns and stops short.
+    arrays = []
+    for column in columns:
+        points = "".join(column).count(".")
+        if points == 0 and max(map(len, column)) <= 18:
+            dtype = numpy.int64
+        elif points == len(column):
+            dtype = numpy.float64
+        else:
+            return None
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                array = numpy.fromstring(" ".join(column), dtype=dtype, sep=" ")
+        except ValueError:
+            return None
+        if len(array) != len(column):
+            return None
+        arrays.append(array)
+    return arrays
+
+
+def power_bits(base, exponent):
+    # Rough size in bits of base ** exponent where it is worked out
+    # exactly (int or Fraction), 0 where it is rounded or cheap anyway
+    if isinstance(exponent, Fraction):
+        if exponent.denominator != 1:
+            return 0
+        exponent = exponent.numerator
+    if not isinstance(exponent, int):
+        return 0
+    if isinstance(base, int):
+        # A negative exponent gives a float
+        return exponent * abs(base).bit_length() if exponent > 0 and abs(base) > 1 else 0
+    if isinstance(base, Fraction) and abs(base) != 1:
+        return abs(exponent) * (abs(base.numerator).bit_length() + base.denominator.bit_length())
+    return 0
+
+
+# Exact results (int or Fraction) past this many bits are refused before
+# any work is done; about ten million digits, some seconds to work out
+RESULT_BITS = 1 << 25
+
+
+def check_size(program, backend=FLOAT, limit=RESULT_BITS):
+    # Runs the code over the size of each value instead of the value, and
+    # raises ResultTooLarge where an exact result would pass limit bits or
+    # a power's exponent is itself too big to know (a tower like 9**9**9).
+    # Each stack entry is (numerator bits, denominator bits, value), the
+    # sizes None for a rounded number (float, Decimal), which is bounded
+    # anyway, and the value only kept while small enough to work out here.
+    rounded_only = backend.parse is decimal.Decimal
+    stack = []
+    for opcode, argument in program.code:
+        if opcode == PUSH:
+            value = backend.parse(program.literals[argument])
+            if rounded_only or isinstance(value, float):
+                stack.append((None, None, None))
+            else:
+                value = Fraction(value)
+                stack.append((abs(value.numerator).bit_length(), value.denominator.bit_length() - 1, value))
+            continue
+        if opcode == UNARY:
+            top, bottom, value = stack[-1]
+            stack[-1] = (top, bottom, None if value is None else argument(value))
+            continue
+        right_top, right_bottom, right = stack.pop()
+        left_top, left_bottom, left = stack[-1]
+        if left_top is None or right_top is None:
+            top = bottom = None
+        elif argument is operator.pow:
+            top, bottom = power_size(left_top, left_bottom, left, right, backend)
+        elif argument is operator.add or argument is operator.sub:
+            top = max(left_top + right_bottom, right_top + left_bottom) + 1
+            bottom = left_bottom + right_bottom
+        elif argument is operator.mul:
+            top, bottom = left_top + right_top, left_bottom + right_bottom
+        elif argument is operator.floordiv:
+            top, bottom = left_top + right_bottom, 0
+        elif backend is FRACTION:
+            top, bottom = left_top + right_bottom, left_bottom + right_top
+        else:
+            top = bottom = None  # int / int gives a float
+        if top is not None and top + bottom > limit:
+            raise ResultTooLarge(f"Result too large: about {(top + bottom) * math.log10(2):,.0f} digits")
+        value = None
+        if top is not None and top + bottom <= 64 and left is not None and right is not None:
+            try:
+                value = argument(left, right)
+            except ArithmeticError:
+                pass  # left for the real run to raise
+        stack[-1] = (top, bottom, value)
+
+
+def power_size(top, bottom, base, exponent, backend):
+    # Numerator and denominator bits of base ** exponent, None if rounded
+    if exponent is not None and exponent.denominator != 1:
+        return None, None  # a fractional power gives a float
+    if base in (0, 1, -1):
+        return top, bottom
+    if exponent is None:
+        raise ResultTooLarge("Exponent too large")
+    if exponent < 0 and backend is not FRACTION:
+        return None, None  # an int to a negative power gives a float
+    if base is not None:
+        top = math.log2(abs(base.numerator))
+        bottom = math.log2(base.denominator)
+    top, bottom = math.ceil(abs(exponent) * top), math.ceil(abs(exponent) * bottom)
+    return (top, bottom) if exponent > 0 else (bottom, top)
+
+
+# Longer ints are shown rounded: str() is quadratic in the length, and
+# refuses more than 4300 digits anyway
+EXACT_BITS = 14000
+ROUNDED_DIGITS = 20
+ROUNDING = decimal.Context(prec=ROUNDED_DIGITS, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+
+
+def rounded(n):
+    # n to ROUNDED_DIGITS digits from its top bits alone, without ever
+    # converting all of it to decimal
+    shift = max(abs(n).bit_length() - 128, 0)
+    with decimal.localcontext(ROUNDING):
+        return decimal.Decimal(n >> shift if n >= 0 else -(-n >> shift)) * decimal.Decimal(2) ** shift
+
+
+def format_number(value):
+    # Text for the display
+    if isinstance(value, int) and abs(value).bit_length() > EXACT_BITS:
+        return f"~{rounded(value):E}"
+    if isinstance(value, Fraction):
+        if abs(value.numerator).bit_length() + value.denominator.bit_length() > EXACT_BITS:
+            with decimal.localcontext(ROUNDING):
+                return f"~{rounded(value.numerator) / rounded(value.denominator):E}"
+    return str(value)
+
+
+# Integer powers past this many bits are left to evaluate() rather than
+# worked out while typing
+LIVE_POWER_BITS = 1 << 16
+
+
+class LiveEvaluator:
+    # The same shunting-yard, fed one character at a time as the buttons
+    # are pressed, and reducing as it goes: an operator is applied as soon
+    # as one that binds less tightly arrives, just as the compiled code
+    # would apply it. What waits is then short (at most + then * for the
+    # four basic operators), so preview() after each key costs the same
+    # however long the expression has grown, and result() at = needs no
+    # parse at all. The operations and their order match evaluate(text).
+    def __init__(self, backend=FLOAT):
+        self.backend = backend
+        self.clear()
+
+    def clear(self):
+        self.chunks = []
+        self.values = []
+        self.waiting = []  # (binding power, opcode, function)
+        self.number = ""  # digits of the number being typed
+        self.symbol = ""  # * or / that a second press may double
+        self.expect_number = True
+        self.error = None
+        # A huge power was met; result() falls back to evaluate()
+        self.deferred = False
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    def feed(self, text):
+        self.chunks.append(text)
+        with self.backend.calculating():
+            for char in text:
+                if self.error is not None or self.deferred:
+                    return
+                try:
+                    self.step(char)
+                except ArithmeticError as e:
+                    # e.g. a division by zero that a later key cannot undo
+                    self.error = e
+
+    def step(self, char):
+        # isdecimal() is what TOKEN's \d matches; isdigit() would also
+        # take superscripts like ², which int() refuses
+        if char.isdecimal() or char == ".":
+            if self.symbol:
+                self.commit(self.symbol)
+            if self.deferred:
+                self.number += char
+            elif not self.expect_number:
+                self.error = ExpressionError(f"Missing operator before {char}")
+            elif char == "." and "." in self.number:
+                self.error = ExpressionError("Unexpected '.'")
+            else:
+                self.number += char
+            return
+        if self.number:
+            self.end_number()
+        if self.symbol:
+            if self.symbol + char in BINARY:
+                self.symbol += char
+                return
+            self.commit(self.symbol)
+        if char.isspace() or self.error is not None or self.deferred:
+            return
+        if char not in BINARY:
+            self.error = ExpressionError(f"Unexpected {char!r}")
+        elif self.expect_number:
+            if char in SIGNS:
+                self.waiting.append((SIGN_POWER, UNARY, SIGNS[char]))
+            else:
+                self.error = ExpressionError(f"Missing number before {char}")
+        elif char in "*/":
+            self.symbol = char
+        else:
+            self.commit(char)
+
+    def end_number(self):
+        if self.number == ".":
+            self.error = ExpressionError("Unexpected '.'")
+            return
+        self.values.append(self.backend.parse(self.number))
+        self.number = ""
+        self.expect_number = False
+
+    def commit(self, symbol):
+        self.symbol = ""
+        power, function = BINARY[symbol]
+        right = symbol in RIGHT_ASSOCIATIVE
+        waiting = self.waiting
+        values = self.values
+        while waiting and (waiting[-1][0] > power or waiting[-1][0] == power and not right):
+            _, opcode, operation = waiting.pop()
+            if opcode == UNARY:
+                values[-1] = operation(values[-1])
+            else:
+                right_value = values.pop()
+                result = self.apply(operation, values[-1], right_value)
+                if result is None:
+                    return
+                values[-1] = result
+        waiting.append((power, BINARY_OP, function))
+        self.expect_number = True
+
+    def apply(self, operation, left, right):
+        # None, and deferred set, for a power too big to work out here
+        if operation is operator.pow and power_bits(left, right) > LIVE_POWER_BITS:
+            self.deferred = True
+            return None
+        return operation(left, right)
+
+    def fold(self, complete):
+        # Applies everything still waiting, top down, to a copy of the
+        # state. Unless complete, a trailing operator is left out.
+        values = list(self.values)
+        waiting = self.waiting
+        if self.number and self.number != ".":
+            values.append(self.backend.parse(self.number))
+        elif self.expect_number:
+            if complete:
+                raise ExpressionError("Missing number at the end" if self.chunks else "Empty expression")
+            # Drop the signs and the operator still waiting for a number
+            end = len(waiting)
+            while end and waiting[end - 1][1] == UNARY:
+                end -= 1
+            waiting = waiting[:end - 1] if end else []
+            if not values:
+                return None
+        elif self.symbol and complete:
+            raise ExpressionError("Missing number at the end")
+        value = values.pop()
+        for _, opcode, operation in reversed(waiting):
+            if opcode == UNARY:
+                value = operation(value)
+            else:
+                value = self.apply(operation, values.pop(), value)
+                if value is None:
+                    return None
+        return value
+
+    def preview(self):
+        # The value if the text ended here, or None
+        if self.error is not None or self.deferred:
+            return None
+        try:
+            with self.backend.calculating():
+                value = self.fold(complete=False)
+        except ArithmeticError:
+            return None
+        # A preview must not leave the state deferred
+        self.deferred = False
+        return value
+
+    def result(self, fallback=True):
+        # Without fallback, None where the text is left to evaluate(), which
+        # may then take long enough to be worth running elsewhere
+        if self.error is not None:
+            raise self.error
+        if not self.deferred:
+            with self.backend.calculating():
+                value = self.fold(complete=True)
+            if not self.deferred:
+                return value
+        if not fallback:
+            return None
+        return evaluate(self.text, self.backend)
+
+
+# Limits for each evaluation in an EvaluationPool worker
+WORKER_SECONDS = 10
+WORKER_MEMORY = 1 << 30
+
+
+def address_space():
+    # Bytes of address space in use, where /proc shows it
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError):
+        return 0
+
+
+def serve(connection, seconds, memory):
+    # Worker loop: (text, backend) in, (value, None) or (None, error) out,
+    # until None or the pipe closes. Memory counts on top of what the
+    # interpreter already maps; CPU time is counted from each request, and
+    # going over it kills the worker with SIGXCPU, as a long int
+    # multiplication never gets back to Python to notice anything gentler.
+    if resource is not None and memory:
+        limit = address_space() + memory
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+        except (ValueError, OSError):
+            pass  # a lower hard limit is already set
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        text, backend = request
+        if resource is not None and seconds:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+            soft = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        try:
+            reply = (evaluate(text, backend), None)
+        except Exception as e:
+            reply = (None, e)
+        connection.send(reply)
+
+
+class EvaluationPool:
+    # Worker processes for evaluations that may run long, so a caller such
+    # as a Tk event loop never blocks: submit() returns a job number at
+    # once, and poll() hands back whatever has finished. A job is stopped
+    # by cancel(), by running past the wall clock timeout, or (where the
+    # resource module exists) by its worker going over the CPU or memory
+    # limit; a stopped worker is killed and replaced. Workers are spawned
+    # rather than forked, so nothing of the caller's (a Tk display
+    # connection, say) is shared with them.
+    def __init__(self, workers=2, timeout=WORKER_SECONDS, seconds=WORKER_SECONDS, memory=WORKER_MEMORY):
+        self.context = multiprocessing.get_context("spawn")
+        self.limits = (seconds, memory)
+        self.timeout = timeout
+        self.jobs = count(1)
+        self.queue = deque()  # (job, text, backend)
+        self.busy = {}  # job -> (process, connection, deadline)
+        self.idle = [self.start() for _ in range(workers)]
+
+    def start(self):
+        connection, child = self.context.Pipe()
+        process = self.context.Process(target=serve, args=(child, *self.limits), daemon=True)
+        process.start()
+        child.close()
+        return process, connection
+
+    def submit(self, text, backend=FLOAT):
+        job = next(self.jobs)
+        self.queue.append((job, text, backend))
+        self.dispatch()
+        return job
+
+    def dispatch(self):
+        while self.queue and self.idle:
+            job, text, backend = self.queue.popleft()
+            process, connection = self.idle.pop()
+            connection.send((text, backend))
+            self.busy[job] = (process, connection, time.monotonic() + self.timeout)
+
+    def poll(self):
+        # [(job, value, error)] for the jobs finished since the last call,
+        # error being None or the exception raised or EvaluationStopped
+        finished = []
+        now = time.monotonic()
+        for job, (process, connection, deadline) in list(self.busy.items()):
+            if connection.poll():
+                try:
+                    value, error = connection.recv()
+                except (EOFError, OSError):
+                    self.replace(process, connection)
+                    value, error = None, EvaluationStopped(self.stopped(process))
+                else:
+                    self.idle.append((process, connection))
+            elif now > deadline:
+                self.replace(process, connection)
+                value, error = None, EvaluationStopped(f"Took longer than {self.timeout} s")
+            else:
+                continue
+            del self.busy[job]
+            finished.append((job, value, error))
+        self.dispatch()
+        return finished
+
+    def stopped(self, process):
+        # Why a worker died
+        process.join()
+        if hasattr(signal, "SIGXCPU") and process.exitcode == -signal.SIGXCPU:
+            return f"Over the CPU limit of {self.limits[0]} s"
+        return f"Worker stopped (exit code {process.exitcode})"
+
+    def cancel(self, job):
+        for queued in self.queue:
+            if queued[0] == job:
+                self.queue.remove(queued)
+                return
+        if job in self.busy:
+            process, connection, _ = self.busy.pop(job)
+            self.replace(process, connection)
+            self.dispatch()
+
+    def replace(self, process, connection):
+        process.kill()
+        process.join()
+        connection.close()
+        # Behind the workers already up, as this one takes a moment to start
+        self.idle.insert(0, self.start())
+
+    def close(self):
+        for process, connection in self.idle:
+            connection.send(None)
+            connection.close()
+        for process, connection, _ in self.busy.values():
+            process.kill()
+            connection.close()
+        self.idle, self.busy = [], {}
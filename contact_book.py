@@ -1,8 +1,107 @@
+import queue
+import statistics
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
+from collections import deque
+from tkinter import ttk, filedialog, messagebox
+
+from contact_engine import ContactStore, SearchCancelled, validate_contact
+
+
+class SearchScheduler:
+    # Debounces search input, runs the query on a worker thread and hands
+    # the newest result back to the Tk thread through root.after. Each new
+    # query bumps the generation; older queries are cancelled mid-search
+    # and their results dropped.
+    POLL_MS = 8
+
+    def __init__(self, root, search, deliver, report=None, debounce_ms=150):
+        self.root = root
+        self.search = search    # search(text, cancelled) -> result
+        self.deliver = deliver  # deliver(result), called on the Tk thread
+        self.report = report    # report(latency_ms), after the result is painted
+        self.debounce_ms = debounce_ms
+
+        self.generation = 0
+        self.dispatched = 0
+        self.delivered = 0
+        self.pending_after = None
+        self.poll_after = None
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.latencies = deque(maxlen=50)  # query-to-paint, in ms
+
+        threading.Thread(target=self.worker, daemon=True).start()
+
+    def schedule(self, text, delay_ms=None):
+        self.cancel()
+        started = time.perf_counter()
+        delay = self.debounce_ms if delay_ms is None else delay_ms
+        self.pending_after = self.root.after(delay, self.dispatch, self.generation, text, started)
+
+    def cancel(self):
+        self.generation += 1
+        if self.pending_after is not None:
+            self.root.after_cancel(self.pending_after)
+            self.pending_after = None
+
+    def dispatch(self, generation, text, started):
+        self.pending_after = None
+        self.dispatched = generation
+        self.requests.put((generation, text, started))
+        if self.poll_after is None:
+            self.poll_after = self.root.after(self.POLL_MS, self.poll)
+
+    def worker(self):
+        while True:
+            generation, text, started = self.requests.get()
+            if generation != self.generation:
+                continue
+            try:
+                result = self.search(text, lambda: generation != self.generation)
+            except SearchCancelled:
+                continue
+            except Exception as e:
+                result = e
+            self.results.put((generation, result, started))
+
+    def poll(self):
+        self.poll_after = None
+        latest = None
+        while True:
+            try:
+                latest = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+        if latest is not None and latest[0] == self.generation:
+            generation, result, started = latest
+            self.delivered = generation
+            if isinstance(result, Exception):
+                raise result
+            self.deliver(result)
+            self.root.update_idletasks()
+            latency = (time.perf_counter() - started) * 1000
+            self.latencies.append(latency)
+            if self.report is not None:
+                self.report(latency)
+
+        # Keep polling while the newest dispatched query is still running
+        if self.dispatched == self.generation and self.delivered != self.generation:
+            self.poll_after = self.root.after(self.POLL_MS, self.poll)
+
+    def median_latency(self):
+        return statistics.median(self.latencies) if self.latencies else 0.0
 
 
 class ContactManagerApp:
+    # The contact list is virtualized: the Treeview only ever holds the rows
+    # that fit on screen (plus a small overscan), and the scrollbar maps to
+    # offsets into self.view, the filtered result list.
+    ROW_HEIGHT = 22
+    OVERSCAN_ROWS = 5
+
     def __init__(self, root):
         self.root = root
         self.root.title("Contact Manager")
@@ -22,9 +121,24 @@ class ContactManagerApp:
 
         self.root.configure(bg=self.bg_color)
 
-        # In-memory contact list: each is a dict
-        self.contacts = []  # {id, name, phone, email, address}
-        self.next_id = 1
+        # Persistent contact store
+        self.store = ContactStore()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Virtual list state: self.view is a list of contact ids
+        self.view = self.store.ids
+        self.view_offset = 0
+        self.selected_contact_id = None
+        self.sort_order = None  # (column, reverse) or None for insertion order
+        self.fuzzy_search = False  # mirrors fuzzy_var for the search worker
+
+        # Searches run off the Tk thread, debounced while typing
+        self.search_scheduler = SearchScheduler(
+            self.root,
+            self.run_search,
+            self.show_search_results,
+            report=self.report_search_latency,
+        )
 
         self.build_ui()
 
@@ -174,6 +288,52 @@ class ContactManagerApp:
         )
         self.clear_button.pack(side="left", padx=5)
 
+        # Bulk import / export
+        tools_frame = tk.Frame(form_frame, bg=self.card_color)
+        tools_frame.grid(row=6, column=0, columnspan=2, pady=(10, 0))
+
+        self.import_button = tk.Button(
+            tools_frame,
+            text="Import...",
+            font=("Segoe UI", 9),
+            bg="#eeeeee",
+            fg="#333333",
+            activebackground="#e0e0e0",
+            activeforeground="#333333",
+            relief="flat",
+            padx=10,
+            command=self.import_contacts,
+        )
+        self.import_button.pack(side="left", padx=5)
+
+        self.export_button = tk.Button(
+            tools_frame,
+            text="Export...",
+            font=("Segoe UI", 9),
+            bg="#eeeeee",
+            fg="#333333",
+            activebackground="#e0e0e0",
+            activeforeground="#333333",
+            relief="flat",
+            padx=10,
+            command=self.export_contacts,
+        )
+        self.export_button.pack(side="left", padx=5)
+
+        self.merge_button = tk.Button(
+            tools_frame,
+            text="Merge Duplicates",
+            font=("Segoe UI", 9),
+            bg="#eeeeee",
+            fg="#333333",
+            activebackground="#e0e0e0",
+            activeforeground="#333333",
+            relief="flat",
+            padx=10,
+            command=self.merge_duplicates,
+        )
+        self.merge_button.pack(side="left", padx=5)
+
         # Right: Search + List
         right_frame = tk.Frame(main_frame, bg=self.card_color)
         right_frame.pack(side="left", fill="both", expand=True, padx=20, pady=20)
@@ -198,7 +358,7 @@ class ContactManagerApp:
             font=("Segoe UI", 10),
         )
         self.search_entry.pack(side="left", padx=(0, 5))
-        self.search_entry.bind("<KeyRelease>", lambda e: self.refresh_contact_list())
+        self.search_entry.bind("<KeyRelease>", lambda e: self.on_search_changed())
 
         self.clear_search_button = tk.Button(
             search_frame,
@@ -213,6 +373,30 @@ class ContactManagerApp:
         )
         self.clear_search_button.pack(side="left", padx=(5, 0))
 
+        self.fuzzy_var = tk.BooleanVar(value=False)
+        self.fuzzy_check = tk.Checkbutton(
+            search_frame,
+            text="Fuzzy names",
+            variable=self.fuzzy_var,
+            font=("Segoe UI", 9),
+            fg=self.text_color,
+            bg=self.card_color,
+            activebackground=self.card_color,
+            command=self.on_fuzzy_toggled,
+        )
+        self.fuzzy_check.pack(side="left", padx=(10, 0))
+
+        # Status line: result count and search latency
+        self.status_var = tk.StringVar()
+        tk.Label(
+            right_frame,
+            textvariable=self.status_var,
+            font=("Segoe UI", 9),
+            fg="#757575",
+            bg=self.card_color,
+            anchor="w",
+        ).pack(side="bottom", fill="x", pady=(5, 0))
+
         # Treeview (contact list)
         list_frame = tk.Frame(right_frame, bg=self.card_color)
         list_frame.pack(fill="both", expand=True)
@@ -225,9 +409,9 @@ class ContactManagerApp:
         )
 
         self.tree.heading("id", text="ID")
-        self.tree.heading("name", text="Name")
-        self.tree.heading("phone", text="Phone")
-        self.tree.heading("email", text="Email")
+        self.tree.heading("name", text="Name", command=lambda: self.sort_by("name"))
+        self.tree.heading("phone", text="Phone", command=lambda: self.sort_by("phone"))
+        self.tree.heading("email", text="Email", command=lambda: self.sort_by("email"))
         self.tree.heading("address", text="Address")
 
         self.tree.column("id", width=0, stretch=False, anchor="w")
@@ -236,12 +420,13 @@ class ContactManagerApp:
         self.tree.column("email", width=180, anchor="w")
         self.tree.column("address", width=250, anchor="w")
 
-        vsb = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
+        # The vertical scrollbar drives self.view_offset, not the Treeview
+        self.vsb = ttk.Scrollbar(list_frame, orient="vertical", command=self.on_scrollbar)
         hsb = ttk.Scrollbar(list_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscroll=vsb.set, xscroll=hsb.set)
+        self.tree.configure(xscroll=hsb.set)
 
         self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
+        self.vsb.grid(row=0, column=1, sticky="ns")
         hsb.grid(row=1, column=0, sticky="ew")
 
         list_frame.rowconfigure(0, weight=1)
@@ -250,6 +435,16 @@ class ContactManagerApp:
         # Bind selection
         self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
 
+        # Scrolling and resizing re-render the visible window
+        self.tree.bind("<Configure>", lambda e: self.render_rows())
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", self.on_mouse_wheel)
+        self.tree.bind("<Button-5>", self.on_mouse_wheel)
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.visible_row_count()))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.visible_row_count()))
+
         # Style Treeview for light mode
         style = ttk.Style()
         style.theme_use("default")
@@ -257,7 +452,7 @@ class ContactManagerApp:
             "Treeview",
             background="white",
             foreground=self.text_color,
-            rowheight=22,
+            rowheight=self.ROW_HEIGHT,
             fieldbackground="white",
             bordercolor=self.border_color,
             borderwidth=1,
@@ -289,29 +484,29 @@ class ContactManagerApp:
         self.phone_entry.delete(0, "end")
         self.email_entry.delete(0, "end")
         self.address_text.delete("1.0", "end")
+        self.selected_contact_id = None
         self.tree.selection_remove(self.tree.selection())
 
     def clear_search(self):
         self.search_var.set("")
-        self.refresh_contact_list()
+        self.on_search_changed()
+
+    def on_search_changed(self):
+        self.view_offset = 0
+        self.refresh_contact_list(delay_ms=self.search_scheduler.debounce_ms)
 
     # ---- CRUD operations ----
     def add_contact(self):
-        name, phone, email, address = self.get_form_data()
+        try:
+            name, phone, email, address = validate_contact(*self.get_form_data())
+        except ValueError as e:
+            messagebox.showwarning("Missing Data", str(e))
+            return
 
-        if not name or not phone:
-            messagebox.showwarning("Missing Data", "Name and Phone are required.")
+        if not self.confirm_unique_phone(phone):
             return
 
-        contact = {
-            "id": self.next_id,
-            "name": name,
-            "phone": phone,
-            "email": email,
-            "address": address,
-        }
-        self.next_id += 1
-        self.contacts.append(contact)
+        self.store.add(name, phone, email, address)
 
         self.refresh_contact_list()
         self.clear_form()
@@ -323,18 +518,16 @@ class ContactManagerApp:
             messagebox.showwarning("No Selection", "Please select a contact to update.")
             return
 
-        name, phone, email, address = self.get_form_data()
-        if not name or not phone:
-            messagebox.showwarning("Missing Data", "Name and Phone are required.")
+        try:
+            name, phone, email, address = validate_contact(*self.get_form_data())
+        except ValueError as e:
+            messagebox.showwarning("Missing Data", str(e))
+            return
+
+        if not self.confirm_unique_phone(phone, exclude=selected_id):
             return
 
-        for contact in self.contacts:
-            if contact["id"] == selected_id:
-                contact["name"] = name
-                contact["phone"] = phone
-                contact["email"] = email
-                contact["address"] = address
-                break
+        self.store.update(selected_id, name, phone, email, address)
 
         self.refresh_contact_list()
         messagebox.showinfo("Success", "Contact updated successfully.")
@@ -349,68 +542,280 @@ class ContactManagerApp:
         if not confirm:
             return
 
-        self.contacts = [c for c in self.contacts if c["id"] != selected_id]
+        self.store.delete(selected_id)
         self.refresh_contact_list()
         self.clear_form()
         messagebox.showinfo("Deleted", "Contact deleted successfully.")
 
-    def refresh_contact_list(self):
+    def confirm_unique_phone(self, phone, exclude=None):
+        if self.store.phone_trie is None:
+            self.status_var.set("Building phone index...")
+            self.root.update_idletasks()
+        # A contact deleted under a stale index entry is no duplicate
+        others = [other for other in map(self.store.get, self.store.find_by_phone(phone, exclude)) if other]
+        if not others:
+            return True
+        other = others[0]
+        return messagebox.askyesno(
+            "Duplicate Phone",
+            f"{other.name} already has the phone number {other.phone}. Save anyway?",
+        )
+
+    def merge_duplicates(self):
+        confirm = messagebox.askyesno(
+            "Merge Duplicates",
+            "Contacts sharing a phone number will be merged into the oldest one. Continue?",
+        )
+        if not confirm:
+            return
+        merged = self.store.merge_duplicates()
+        self.refresh_contact_list()
+        self.clear_form()
+        messagebox.showinfo("Merge Duplicates", f"Removed {merged} duplicate contacts.")
+
+    # ---- Bulk import / export ----
+    # File work runs on a worker thread that reports through a bounded queue;
+    # poll_file_job drains it on the Tk thread with root.after.
+    FILE_TYPES = [
+        ("Contact files", "*.csv *.jsonl *.ndjson *.vcf *.vcard"),
+        ("CSV", "*.csv"),
+        ("JSON Lines", "*.jsonl *.ndjson"),
+        ("vCard", "*.vcf *.vcard"),
+    ]
+
+    def import_contacts(self):
+        path = filedialog.askopenfilename(title="Import Contacts", filetypes=self.FILE_TYPES)
+        if not path:
+            return
+
+        def work(updates):
+            for rows, skipped, progress in self.store.import_batches(path):
+                updates.put(("batch", rows, skipped, progress))
+
+        self.start_file_job(work, {"imported": 0, "skipped": 0})
+
+    def export_contacts(self):
+        path = filedialog.asksaveasfilename(
+            title="Export Contacts",
+            filetypes=self.FILE_TYPES,
+            defaultextension=".csv",
+        )
+        if not path:
+            return
+        self.status_var.set("Exporting...")
+        self.start_file_job(lambda updates: self.store.export_file(path), {"exported": path})
+
+    def start_file_job(self, work, job):
+        updates = queue.Queue(maxsize=4)
+
+        def run():
+            try:
+                work(updates)
+                updates.put(("done",))
+            except Exception as e:
+                updates.put(("error", e))
+
+        for button in (self.import_button, self.export_button, self.merge_button):
+            button.configure(state="disabled")
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(50, self.poll_file_job, updates, job)
+
+    def poll_file_job(self, updates, job):
+        finished = None
+        progress = None
+        while finished is None:
+            try:
+                message = updates.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "batch":
+                _, rows, skipped, progress = message
+                self.store.register_imported(rows)
+                job["imported"] += len(rows)
+                job["skipped"] += skipped
+            else:
+                finished = message
+
+        if progress is not None:
+            # One list refresh for everything that arrived since the last poll
+            self.refresh_contact_list()
+            self.status_var.set(f"Importing... {progress:.0%} ({job['imported']} contacts)")
+
+        if finished is None:
+            self.root.after(50, self.poll_file_job, updates, job)
+            return
+
+        for button in (self.import_button, self.export_button, self.merge_button):
+            button.configure(state="normal")
+        self.refresh_contact_list()
+        if finished[0] == "error":
+            messagebox.showerror("Error", str(finished[1]))
+        elif "exported" in job:
+            messagebox.showinfo("Exported", f"Contacts exported to {job['exported']}.")
+        else:
+            message = f"Imported {job['imported']} contacts."
+            if job["skipped"]:
+                message += f" Skipped {job['skipped']} rows without a name or phone."
+            messagebox.showinfo("Imported", message)
+
+    def refresh_contact_list(self, delay_ms=0):
         search_text = self.search_var.get().strip().lower()
 
-        # Clear existing rows
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        # Insert filtered contacts
-        for contact in self.contacts:
-            if search_text:
-                if (search_text not in contact["name"].lower()
-                        and search_text not in contact["phone"].lower()):
-                    continue
-
-            self.tree.insert(
-                "",
-                "end",
-                values=(
-                    contact["id"],
-                    contact["name"],
-                    contact["phone"],
-                    contact["email"],
-                    contact["address"].replace("\n", " "),
-                ),
-            )
+        if search_text:
+            # Results arrive later through show_search_results
+            self.search_scheduler.schedule(search_text, delay_ms)
+        else:
+            self.search_scheduler.cancel()
+            if self.sort_order is None:
+                self.view = self.store.ids
+            else:
+                self.view = self.store.sorted_view(*self.sort_order)
+            self.render_rows()
+            self.status_var.set(f"{len(self.view)} contacts")
+
+    def run_search(self, text, cancelled):
+        # Runs on the search worker thread
+        return self.store.search(text, cancelled, self.sort_order, self.fuzzy_search)
+
+    def on_fuzzy_toggled(self):
+        self.fuzzy_search = self.fuzzy_var.get()
+        self.on_search_changed()
+
+    def sort_by(self, column):
+        # First click sorts ascending, the next one flips the direction
+        reverse = self.sort_order == (column, False)
+        if column not in self.store.sort_indexes:
+            self.status_var.set("Building sort index...")
+            self.root.update_idletasks()
+        self.store.sorted_view(column)
+        self.sort_order = (column, reverse)
+
+        for name in ContactStore.SORT_COLUMNS:
+            text = name.capitalize()
+            if name == column:
+                text += " \u25bc" if reverse else " \u25b2"
+            self.tree.heading(name, text=text)
+
+        self.view_offset = 0
+        self.refresh_contact_list()
+
+    def show_search_results(self, contact_ids):
+        self.view = contact_ids
+        self.render_rows()
+
+    def report_search_latency(self, latency_ms):
+        self.status_var.set(
+            f"{len(self.view)} contacts  |  search {latency_ms:.1f} ms "
+            f"(median {self.search_scheduler.median_latency():.1f} ms)"
+        )
+
+    # ---- Virtual list ----
+    def visible_row_count(self):
+        # The heading takes roughly one row of the widget's height
+        return max(1, self.tree.winfo_height() // self.ROW_HEIGHT - 1)
+
+    def render_rows(self):
+        total = len(self.view)
+        visible = self.visible_row_count()
+        self.view_offset = max(0, min(self.view_offset, total - visible))
+        window = self.store.get_many(self.view[self.view_offset:self.view_offset + visible + self.OVERSCAN_ROWS])
+
+        # Reuse the existing row items, then add or trim rows to fit the window
+        rows = self.tree.get_children()
+        for item, contact in zip(rows, window):
+            self.tree.item(item, values=contact.row)
+        for contact in window[len(rows):]:
+            self.tree.insert("", "end", values=contact.row)
+        if len(rows) > len(window):
+            self.tree.delete(*rows[len(window):])
+
+        # Keep the selection on the selected contact, not on a row slot
+        selected = [
+            item for item, contact in zip(self.tree.get_children(), window)
+            if contact.id == self.selected_contact_id
+        ]
+        if tuple(selected) != self.tree.selection():
+            self.tree.selection_set(selected)
+        self.tree.yview_moveto(0)
+
+        if total:
+            self.vsb.set(self.view_offset / total, min(total, self.view_offset + visible) / total)
+        else:
+            self.vsb.set(0, 1)
+
+    def scroll_rows(self, delta):
+        self.view_offset += delta
+        self.render_rows()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.view_offset = int(float(amount) * len(self.view))
+            self.render_rows()
+        elif action == "scroll":
+            step = self.visible_row_count() if unit == "pages" else 1
+            self.scroll_rows(int(amount) * step)
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_rows(-3)
+        else:
+            self.scroll_rows(3)
+        return "break"
+
+    def move_selection(self, delta):
+        # Arrow and page keys walk the whole view, scrolling the window as needed
+        if not self.view:
+            return "break"
+        visible = self.visible_row_count()
+        window_ids = self.view[self.view_offset:self.view_offset + visible]
+        if self.selected_contact_id in window_ids:
+            position = self.view_offset + window_ids.index(self.selected_contact_id) + delta
+        else:
+            position = self.view_offset
+        position = max(0, min(len(self.view) - 1, position))
+
+        if position < self.view_offset:
+            self.view_offset = position
+        elif position >= self.view_offset + visible:
+            self.view_offset = position - visible + 1
+
+        self.selected_contact_id = self.view[position]
+        self.fill_form(self.store.get(self.selected_contact_id))
+        self.render_rows()
+        return "break"
 
     def on_tree_select(self, event):
         selection = self.tree.selection()
         if not selection:
             return
         item = selection[0]
-        values = self.tree.item(item, "values")
-        # values: (id, name, phone, email, address)
-        _, name, phone, email, address = values
+        contact_id = int(self.tree.item(item, "values")[0])
+        if contact_id == self.selected_contact_id:
+            # Re-selected after a scroll; keep whatever is in the form
+            return
+        self.selected_contact_id = contact_id
+        self.fill_form(self.store.get(contact_id))
 
+    def fill_form(self, contact):
         self.name_entry.delete(0, "end")
-        self.name_entry.insert(0, name)
+        self.name_entry.insert(0, contact.name)
 
         self.phone_entry.delete(0, "end")
-        self.phone_entry.insert(0, phone)
+        self.phone_entry.insert(0, contact.phone)
 
         self.email_entry.delete(0, "end")
-        self.email_entry.insert(0, email)
+        self.email_entry.insert(0, contact.email)
 
         self.address_text.delete("1.0", "end")
-        self.address_text.insert("1.0", address)
+        self.address_text.insert("1.0", contact.address)
 
-    # Helper to get ID from first value
+    # Helper to get the ID of the selected contact
     def get_selected_contact_id(self):
-        selection = self.tree.selection()
-        if not selection:
-            return None
-        item_id = selection[0]
-        values = self.tree.item(item_id, "values")
-        if not values:
-            return None
-        return int(values[0])
+        return self.selected_contact_id
+
+    def close(self):
+        self.store.close()
+        self.root.destroy()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,504 @@
+# Benchmarks for the headless contact engine (contact_engine.py). Nothing
+# here needs a display. Run everything, or one group with --only:
+#
+#     python contact_book_bench.py --sizes 10000 100000 --save baseline.json
+#     python contact_book_bench.py --sizes 10000 100000 --check baseline.json
+#
+# --check exits with status 1 when any metric is slower than the baseline by
+# more than --tolerance (a fraction, 0.25 by default; --io-tolerance, 0.6,
+# for metrics bound by SQLite and the disk) and by more than NOISE_SECONDS.
+# Both --save and --check keep the best of --runs runs of everything (5 by
+# default): noise only ever slows a run down, so the best of several runs
+# spread over a minute is what stays put between two invocations.
+import argparse
+import gc
+import json
+import os
+import sys
+import random
+import string
+import tempfile
+import time
+import tracemalloc
+
+from contact_engine import (
+    CONTACT_FIELDS, PHONE_QUERY, Contact, ContactStore, FuzzyIndex, PhoneTrie, SortedIndex,
+    SortedView, TrigramIndex, contact_format, edit_distance, normalize_phone,
+)
+
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael",
+    "Linda", "David", "Elizabeth", "William", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Priya",
+    "Rahul", "Sumit", "Anita", "Wei", "Yuki", "Omar", "Fatima", "Lucas",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Chaudhari", "Sharma", "Patel", "Chen",
+    "Tanaka", "Hassan", "Silva", "Novak", "Kowalski", "Nguyen",
+]
+QUERIES = ["sumit", "chaudhari", "ann", "555-01", "+1 (555) 12", "xyz", "jo"]
+
+
+def make_contacts(count, seed=0):
+    rng = random.Random(seed)
+    contacts = []
+    for cid in range(1, count + 1):
+        suffix = "".join(rng.choice(string.ascii_lowercase) for _ in range(3))
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{suffix}"
+        phone = f"+1 {rng.randrange(200, 1000)}-555-{rng.randrange(10000):04d}"
+        contacts.append({
+            "id": cid,
+            "name": name,
+            "phone": phone,
+            "email": f"{name.split()[0].lower()}{cid}@example.com",
+            "address": f"{rng.randrange(1, 999)} Main Street\nSpringfield",
+        })
+    return contacts
+
+
+def linear_search(contacts, search_text):
+    # A plain scan with the same matching rules as TrigramIndex.search.
+    digits = normalize_phone(search_text) if PHONE_QUERY.fullmatch(search_text) else ""
+    return [
+        c["id"] for c in contacts
+        if search_text in c["name"].lower() or (digits and digits in normalize_phone(c["phone"]))
+    ]
+
+
+# metric name -> (values, higher_is_better, seconds, io), one value per run,
+# filled in by the bench functions. seconds is the wall time each value was
+# worked out from, for timings and rates; memory has none. io marks metrics
+# that go through SQLite and the disk, which are checked with --io-tolerance.
+RESULTS = {}
+
+# Slowdowns smaller than this are timer and scheduler noise, however large
+# they are relative to a sub-millisecond timing
+NOISE_SECONDS = 0.0005
+
+
+def record(name, value, higher_is_better=False, seconds=None, io=False):
+    values, _, times, _ = RESULTS.setdefault(name, ([], higher_is_better, [], io))
+    values.append(value)
+    if seconds is not None:
+        times.append(seconds)
+
+
+def best_results():
+    # name -> (value, higher_is_better, seconds or None, io), each the best
+    # over the runs: noise only ever makes a run slower
+    results = {}
+    for name, (values, higher_is_better, times, io) in RESULTS.items():
+        best = max(values) if higher_is_better else min(values)
+        results[name] = (best, higher_is_better, min(times, default=None), io)
+    return results
+
+
+def check_regressions(baseline_path, tolerance, io_tolerance):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    results = best_results()
+    regressions = []
+    noise = 0
+    for name, (value, higher_is_better, seconds, io) in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old = baseline[name][0]
+        # Allowed slowdowns hold for rates and timings alike
+        allowed = 1 + (io_tolerance if io else tolerance)
+        if higher_is_better:
+            worse = value * allowed < old
+        else:
+            worse = value > old * allowed
+        if not worse:
+            continue
+        if seconds is not None:
+            # The baseline's time for the same work, from the ratio of values
+            before = seconds * (value / old if higher_is_better else old / value)
+            if seconds - before < NOISE_SECONDS:
+                noise += 1
+                continue
+        regressions.append(f"  {name}: {old:.4g} -> {value:.4g}")
+    limits = f"{tolerance:.0%}, {io_tolerance:.0%} for I/O"
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {limits}:")
+        print("\n".join(regressions))
+        return False
+    print(f"\nNo regressions beyond {limits} ({len(results)} metrics checked, "
+          f"{noise} slower by less than {NOISE_SECONDS * 1000:g} ms)")
+    return True
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def best_build(build, repeat):
+    # (best time, last result) over fresh builds, with the cyclic GC kept out of the timing
+    best = float("inf")
+    for _ in range(repeat):
+        gc.disable()
+        start = time.perf_counter()
+        built = build()
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best, built
+
+
+def bench_search(sizes, repeat):
+    print("Search: trigram index vs linear scan (best of %d, ms per query)" % repeat)
+    print(f"{'contacts':>10} {'query':>10} {'matches':>8} {'scan':>10} {'index':>10} {'speedup':>9}")
+    for size in sizes:
+        contacts = make_contacts(size)
+
+        def build_index():
+            index = TrigramIndex()
+            for c in contacts:
+                index.add(c["id"], c["name"].lower(), normalize_phone(c["phone"]))
+            return index
+
+        build, index = best_build(build_index, repeat)
+        record(f"search/{size}/build_ms", build * 1000, seconds=build)
+        print(f"{size:>10} index built in {build * 1000:.0f} ms")
+
+        for query in QUERIES:
+            expected = linear_search(contacts, query)
+            if index.search(query) != expected:
+                raise SystemExit(f"index returned different results for {query!r}")
+            scan = best_of(lambda: linear_search(contacts, query), repeat)
+            indexed = best_of(lambda: index.search(query), repeat)
+            record(f"search/{size}/{query}/index_ms", indexed * 1000, seconds=indexed)
+            print(
+                f"{size:>10} {query:>10} {len(expected):>8} {scan * 1000:>10.3f} "
+                f"{indexed * 1000:>10.3f} {scan / indexed:>8.1f}x"
+            )
+
+
+class ListContacts:
+    # The list-of-dicts storage ContactManagerApp used before ContactStore.
+    def __init__(self):
+        self.contacts = []
+        self.next_id = 1
+
+    def add(self, name, phone, email, address):
+        contact = {"id": self.next_id, "name": name, "phone": phone, "email": email, "address": address}
+        self.next_id += 1
+        self.contacts.append(contact)
+        return contact
+
+    def update(self, contact_id, name, phone, email, address):
+        for contact in self.contacts:
+            if contact["id"] == contact_id:
+                contact.update(name=name, phone=phone, email=email, address=address)
+                break
+
+    def delete(self, contact_id):
+        self.contacts = [c for c in self.contacts if c["id"] != contact_id]
+
+
+def add_contact(store, c):
+    record = store.add(c["name"], c["phone"], c["email"], c["address"])
+    return record.id if isinstance(record, Contact) else record["id"]
+
+
+def run_crud(store, contacts, ops, seed=1):
+    # Mixed workload: 50% add, 30% update, 20% delete of a live contact.
+    rng = random.Random(seed)
+    live = [add_contact(store, c) for c in contacts]
+    start = time.perf_counter()
+    for i in range(ops):
+        roll = rng.random()
+        c = contacts[i % len(contacts)]
+        if roll < 0.5 or not live:
+            live.append(add_contact(store, c))
+        elif roll < 0.8:
+            store.update(rng.choice(live), c["name"], c["phone"], c["email"], c["address"])
+        else:
+            pos = rng.randrange(len(live))
+            live[pos], live[-1] = live[-1], live[pos]
+            store.delete(live.pop())
+    return ops / (time.perf_counter() - start)
+
+
+def bench_crud(sizes, ops):
+    print(f"Mixed CRUD: list of dicts vs ContactStore ({ops} ops, ops/s)")
+    print(f"{'contacts':>10} {'list':>12} {'store':>12} {'speedup':>9}")
+    for size in sizes:
+        contacts = make_contacts(size)
+        list_rate = run_crud(ListContacts(), contacts, ops)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ContactStore(os.path.join(tmp, "contacts.db"))
+            store_rate = run_crud(store, contacts, ops)
+            store.close()
+        record(f"crud/{size}/store_ops_per_s", store_rate, True, ops / store_rate, io=True)
+        print(f"{size:>10} {list_rate:>12.0f} {store_rate:>12.0f} {store_rate / list_rate:>8.1f}x")
+
+
+def measure(build):
+    tracemalloc.start()
+    records = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size
+
+
+def bench_memory(sizes):
+    # The field strings are shared with `rows` and not counted, so this is
+    # the per-record overhead of each layout. "dict+keys" is a dict that
+    # caches the same derived strings Contact does (lowercase keys and the
+    # one-line address).
+    print("Memory: dict per contact vs Contact (__slots__), bytes per record")
+    print(f"{'contacts':>10} {'dict':>10} {'dict+keys':>10} {'Contact':>10} {'saved':>8}")
+    for size in sizes:
+        rows = [
+            (c["id"], c["name"], c["phone"], c["email"], c["address"])
+            for c in make_contacts(size)
+        ]
+        dict_bytes = measure(lambda: [
+            {"id": i, "name": n, "phone": p, "email": e, "address": a}
+            for i, n, p, e, a in rows
+        ])
+        keyed_bytes = measure(lambda: [
+            {
+                "id": i, "name": n, "phone": p, "email": e, "address": a,
+                "name_key": n.lower(), "phone_key": p.lower(),
+                "address_line": a.replace("\n", " "),
+            }
+            for i, n, p, e, a in rows
+        ])
+        slots_bytes = measure(lambda: [Contact(*row) for row in rows])
+        record(f"memory/{size}/contact_bytes", slots_bytes / size)
+        print(
+            f"{size:>10} {dict_bytes / size:>10.0f} {keyed_bytes / size:>10.0f} "
+            f"{slots_bytes / size:>10.0f} {1 - slots_bytes / keyed_bytes:>7.0%}"
+        )
+
+
+def bench_import(sizes, repeat, formats=(".csv", ".jsonl", ".vcf")):
+    print("Bulk import / export (contacts per second)")
+    print(f"{'contacts':>10} {'format':>7} {'import':>12} {'export':>12}")
+    for size in sizes:
+        rows = [tuple(c[field] for field in CONTACT_FIELDS) for c in make_contacts(size)]
+        for extension in formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                source = os.path.join(tmp, "source" + extension)
+                with open(source, "w", newline="", encoding="utf-8") as f:
+                    contact_format(source)[1](f, rows)
+
+                # Each attempt imports into a fresh store; the last one is kept for the export
+                import_time = float("inf")
+                for attempt in range(repeat):
+                    store = ContactStore(os.path.join(tmp, f"contacts{attempt}.db"))
+                    start = time.perf_counter()
+                    imported, _ = store.import_file(source)
+                    import_time = min(import_time, time.perf_counter() - start)
+                    if imported != size:
+                        raise SystemExit(f"imported {imported} of {size} contacts from {extension}")
+                    if attempt < repeat - 1:
+                        store.close()
+
+                target = os.path.join(tmp, "export" + extension)
+                export_time = best_of(lambda: store.export_file(target), repeat)
+                store.close()
+            fmt = extension[1:]
+            record(f"import/{size}/{fmt}_per_s", size / import_time, True, import_time, io=True)
+            record(f"export/{size}/{fmt}_per_s", size / export_time, True, export_time, io=True)
+            print(f"{size:>10} {extension:>7} {size / import_time:>12.0f} {size / export_time:>12.0f}")
+
+
+def bench_sort(sizes, repeat, page=45):
+    print("Sorted view: full sorted() per refresh vs maintained SortedIndex (ms)")
+    print(f"{'contacts':>10} {'sorted()':>10} {'insert':>10} {'delete':>10} {'page':>10}")
+    for size in sizes:
+        contacts = make_contacts(size)
+        pairs = [(c["name"].lower(), c["id"]) for c in contacts]
+        index = SortedIndex(pairs)
+        view = SortedView(index, reverse=True)
+        rng = random.Random(2)
+
+        full = best_of(lambda: sorted(pairs), repeat)
+        next_id = size + 1
+
+        def insert():
+            nonlocal next_id
+            index.add(next_id, rng.choice(pairs)[0])
+            next_id += 1
+
+        inserted = best_of(insert, repeat)
+        deleted = best_of(lambda: index.remove(rng.choice(pairs)[1]), repeat)
+        def read_page():
+            start = rng.randrange(size - page)
+            return view[start:start + page]
+
+        paged = best_of(read_page, repeat)
+        record(f"sort/{size}/insert_ms", inserted * 1000, seconds=inserted)
+        record(f"sort/{size}/delete_ms", deleted * 1000, seconds=deleted)
+        record(f"sort/{size}/page_ms", paged * 1000, seconds=paged)
+        print(
+            f"{size:>10} {full * 1000:>10.1f} {inserted * 1000:>10.3f} "
+            f"{deleted * 1000:>10.3f} {paged * 1000:>10.3f}"
+        )
+
+
+def bench_phone(sizes, repeat, duplicate_rate=0.1):
+    print(f"Phone lookup and dedup ({duplicate_rate:.0%} duplicates)")
+    print(f"{'contacts':>10} {'trie build':>11} {'lookup ms':>10} {'merge s':>9} {'merged':>8}")
+    for size in sizes:
+        contacts = make_contacts(size)
+        rng = random.Random(3)
+        # Re-type some numbers in another format so only normalization finds them
+        for c in rng.sample(contacts, int(size * duplicate_rate)):
+            digits = normalize_phone(rng.choice(contacts)["phone"])
+            c["phone"] = f"{digits[0]} ({digits[1:4]}) {digits[4:]}"
+
+        digits = [(normalize_phone(c["phone"]), c["id"]) for c in contacts]
+
+        def build_trie():
+            trie = PhoneTrie()
+            for number, cid in digits:
+                trie.add(number, cid)
+            return trie
+
+        build, trie = best_build(build_trie, repeat)
+        lookup = best_of(lambda: trie.find(normalize_phone(rng.choice(contacts)["phone"])), repeat)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "source.csv")
+            with open(source, "w", newline="", encoding="utf-8") as f:
+                contact_format(source)[1](f, (tuple(c[field] for field in CONTACT_FIELDS) for c in contacts))
+            store = ContactStore(os.path.join(tmp, "contacts.db"))
+            store.import_file(source)
+            start = time.perf_counter()
+            merged = store.merge_duplicates()
+            merge = time.perf_counter() - start
+            store.close()
+        record(f"phone/{size}/lookup_ms", lookup * 1000, seconds=lookup)
+        record(f"phone/{size}/merge_s", merge, seconds=merge, io=True)
+        print(f"{size:>10} {build * 1000:>9.0f}ms {lookup * 1000:>10.4f} {merge:>9.2f} {merged:>8}")
+
+
+def make_names(count, seed=4):
+    # Surnames built from syllables, so the vocabulary grows with the data
+    # set the way a real directory's does instead of being a fixed list
+    rng = random.Random(seed)
+    syllables = ["ka", "ri", "mo", "sha", "ten", "lo", "vi", "dar", "nu", "pe", "zan", "chi", "ro", "bel"]
+    surnames = [
+        "".join(rng.choice(syllables) for _ in range(rng.randrange(2, 4))).capitalize()
+        for _ in range(max(100, count // 20))
+    ]
+    return [f"{rng.choice(FIRST_NAMES)} {rng.choice(surnames)}" for _ in range(count)]
+
+
+def typo(word, rng):
+    i = rng.randrange(len(word))
+    edit = rng.choice(("delete", "insert", "replace"))
+    letter = rng.choice(string.ascii_lowercase)
+    if edit == "delete":
+        return word[:i] + word[i + 1:]
+    if edit == "insert":
+        return word[:i] + letter + word[i:]
+    return word[:i] + letter + word[i + 1:]
+
+
+def brute_force_fuzzy(names, text):
+    # Edit distance against every word of every contact
+    queries = text.split()
+    matches = []
+    for cid, name in enumerate(names):
+        words = name.lower().split()
+        total = 0
+        for query in queries:
+            limit = 1 if len(query) <= 4 else FuzzyIndex.MAX_DISTANCE
+            best = min(edit_distance(query, word, limit) for word in words)
+            if best > limit:
+                break
+            total += best
+        else:
+            matches.append(cid)
+    return matches
+
+
+def bench_fuzzy(sizes, repeat, brute_force_limit=100_000):
+    print("Fuzzy name search: deletion index vs edit distance against every contact (ms)")
+    print(f"{'contacts':>10} {'build s':>8} {'query':>22} {'matches':>8} {'scan':>10} {'index':>10}")
+    for size in sizes:
+        names = make_names(size)
+
+        def build_index():
+            index = FuzzyIndex()
+            for cid, name in enumerate(names):
+                index.add(cid, name.lower())
+            return index
+
+        build, index = best_build(build_index, repeat)
+
+        record(f"fuzzy/{size}/build_s", build, seconds=build)
+        rng = random.Random(5)
+        for n in range(3):
+            first, last = rng.choice(names).lower().split()
+            query = f"{typo(first, rng)} {typo(last, rng)}"
+            found = index.search(query)
+            indexed = best_of(lambda: index.search(query), repeat)
+            record(f"fuzzy/{size}/query{n}_ms", indexed * 1000, seconds=indexed)
+            if size <= brute_force_limit:
+                expected = brute_force_fuzzy(names, query)
+                if sorted(found) != expected:
+                    raise SystemExit(f"fuzzy index returned different results for {query!r}")
+                scan = f"{best_of(lambda: brute_force_fuzzy(names, query), 1) * 1000:.1f}"
+            else:
+                scan = "-"
+            print(
+                f"{size:>10} {build:>8.1f} {query:>22} {len(found):>8} {scan:>10} "
+                f"{indexed * 1000:>10.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contact book benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ops", type=int, default=2000, help="operations per CRUD run")
+    parser.add_argument("--only", choices=["search", "crud", "memory", "import", "sort", "phone", "fuzzy"])
+    parser.add_argument("--save", metavar="BASELINE", help="write the metrics of this run to a JSON file")
+    parser.add_argument("--check", metavar="BASELINE", help="compare this run against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before --check fails")
+    parser.add_argument("--io-tolerance", type=float, default=0.6, help="the same for SQLite metrics")
+    parser.add_argument("--runs", type=int, help="runs to keep the best of (5 with --save or --check)")
+    args = parser.parse_args()
+    runs = args.runs or (5 if args.save or args.check else 1)
+    for run in range(runs):
+        if runs > 1:
+            print(f"\nRun {run + 1} of {runs}")
+        if args.only in (None, "search"):
+            bench_search(args.sizes, args.repeat)
+        if args.only in (None, "crud"):
+            bench_crud(args.sizes, args.ops)
+        if args.only in (None, "memory"):
+            bench_memory(args.sizes)
+        if args.only in (None, "import"):
+            bench_import(args.sizes, args.repeat)
+        if args.only in (None, "sort"):
+            bench_sort(args.sizes, args.repeat)
+        if args.only in (None, "phone"):
+            bench_phone(args.sizes, args.repeat)
+        if args.only in (None, "fuzzy"):
+            bench_fuzzy(args.sizes, args.repeat)
+    if args.save:
+        # The same [value, higher_is_better] pairs as before, plus the time
+        baseline = {name: list(result[:3]) for name, result in best_results().items()}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nSaved {len(RESULTS)} metrics to {args.save}")
+    if args.check and not check_regressions(args.check, args.tolerance, args.io_tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
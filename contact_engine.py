@@ -0,0 +1,932 @@
+import csv
+import gc
+import json
+import os
+import re
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+# Headless contact engine: records, search/sort/phone indexes, the SQLite
+# store and import/export formats. ContactManagerApp in contact_book.py is
+# a Tk front end over ContactStore; nothing here imports tkinter, so the
+# engine can be scripted, profiled and benchmarked without a display.
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+def validate_contact(name, phone, email, address):
+    # Returns the fields stripped, or raises ValueError with a message fit
+    # for the user
+    name, phone, email, address = (field.strip() for field in (name, phone, email, address))
+    if not name or not phone:
+        raise ValueError("Name and Phone are required.")
+    return name, phone, email, address
+
+
+class Contact:
+    # One contact record. The lowercase search keys and the one-line address
+    # shown in the Treeview are computed once when the record is created
+    # instead of on every refresh; __slots__ keeps the per-record overhead
+    # well below a dict's.
+    __slots__ = ("id", "name", "phone", "email", "address", "name_key", "phone_digits", "address_line")
+
+    def __init__(self, contact_id, name, phone, email, address):
+        self.id = contact_id
+        self.name = name
+        self.phone = phone
+        self.email = email
+        self.address = address
+        self.name_key = normalized(name.lower(), name)
+        self.phone_digits = normalized(normalize_phone(phone), phone)
+        self.address_line = address.replace("\n", " ")
+
+    @property
+    def row(self):
+        return (self.id, self.name, self.phone, self.email, self.address_line)
+
+
+def normalized(key, original):
+    # Share the original string when normalizing did not change it
+    return original if key == original else key
+
+
+NON_DIGITS = re.compile(r"\D")
+PHONE_QUERY = re.compile(r"[\d\s()+./-]+")
+
+
+def normalize_phone(phone):
+    # Canonical form used for phone search and duplicate detection: the
+    # digits alone, so "+1 (555) 123-4567" becomes "15551234567"
+    return NON_DIGITS.sub("", phone)
+
+
+class TrigramIndex:
+    # Inverted index from 3-character substrings to contact ids. Any string
+    # containing the query also contains every trigram of the query, so
+    # intersecting their posting lists yields a small candidate set that is
+    # then verified with a plain substring check.
+    def __init__(self):
+        self.postings = {}  # trigram -> set of ids
+        self.keys = {}      # id -> (name_key, phone_digits)
+
+    @staticmethod
+    def trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, contact_id, name_key, phone_digits):
+        # Keys are expected normalized already (see Contact)
+        keys = (name_key, phone_digits)
+        self.keys[contact_id] = keys
+        for key in keys:
+            for gram in self.trigrams(key):
+                self.postings.setdefault(gram, set()).add(contact_id)
+
+    def remove(self, contact_id):
+        keys = self.keys.pop(contact_id, None)
+        if keys is None:
+            return
+        for key in keys:
+            for gram in self.trigrams(key):
+                ids = self.postings.get(gram)
+                if ids is None:
+                    continue
+                ids.discard(contact_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def update(self, contact_id, name_key, phone_digits):
+        self.remove(contact_id)
+        self.add(contact_id, name_key, phone_digits)
+
+    def candidates(self, term):
+        postings = []
+        for gram in self.trigrams(term):
+            ids = self.postings.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def search(self, text, cancelled=None):
+        # Returns matching ids in ascending (insertion) order. `cancelled` is
+        # polled during long scans; when it returns True the search stops
+        # with SearchCancelled.
+        text = text.lower()
+        # A phone-like query is also matched against the digits-only form of
+        # each number, so "+1 (555) 123" finds "5551234" and the reverse
+        digits = normalize_phone(text) if PHONE_QUERY.fullmatch(text) else ""
+
+        if len(text) < 3 or 0 < len(digits) < 3:
+            # Too short to have a trigram: fall back to scanning the keys.
+            keys = self.keys.items()
+        else:
+            candidates = self.candidates(text)
+            if digits and digits != text:
+                candidates |= self.candidates(digits)
+            keys = ((cid, self.keys[cid]) for cid in candidates)
+
+        matches = []
+        for i, (cid, (name, phone)) in enumerate(keys):
+            if cancelled is not None and not i & 0xFFFF and cancelled():
+                raise SearchCancelled
+            if text in name or (digits and digits in phone):
+                matches.append(cid)
+        matches.sort()
+        return matches
+
+
+def edit_distance(a, b, limit):
+    # Levenshtein distance between a and b, or limit + 1 as soon as it is
+    # certain to exceed limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+class FuzzyIndex:
+    # Typo-tolerant name search using a SymSpell-style deletion index: every
+    # distinct name word is filed under each string obtainable by deleting
+    # up to MAX_DISTANCE characters from its first PREFIX_LENGTH characters.
+    # Two words within that edit distance share such a string, so a query
+    # only computes edit distances for the handful of words it reaches
+    # through its own deletions, never for every contact.
+    MAX_DISTANCE = 2
+    PREFIX_LENGTH = 7
+    WORDS = re.compile(r"\w+")
+
+    def __init__(self):
+        self.postings = {}  # word -> set of ids
+        self.deletes = {}   # deletion -> word, or set of words
+        self.names = {}     # id -> name_key, for ranking and removal
+
+    @classmethod
+    def deletions(cls, word):
+        results = frontier = {word[:cls.PREFIX_LENGTH]}
+        for _ in range(cls.MAX_DISTANCE):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            results = results | frontier
+        return results
+
+    def add(self, contact_id, name_key, phone_digits=None):
+        # Same signature as TrigramIndex.add; phone numbers are not indexed
+        self.names[contact_id] = name_key
+        for word in set(self.WORDS.findall(name_key)):
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                for deletion in self.deletions(word):
+                    entry = self.deletes.get(deletion)
+                    if entry is None:
+                        self.deletes[deletion] = word
+                    elif isinstance(entry, str):
+                        self.deletes[deletion] = {entry, word}
+                    else:
+                        entry.add(word)
+            ids.add(contact_id)
+
+    def remove(self, contact_id):
+        name_key = self.names.pop(contact_id, None)
+        if name_key is None:
+            return
+        for word in set(self.WORDS.findall(name_key)):
+            ids = self.postings[word]
+            ids.discard(contact_id)
+            if ids:
+                continue
+            del self.postings[word]
+            for deletion in self.deletions(word):
+                entry = self.deletes[deletion]
+                if isinstance(entry, str):
+                    del self.deletes[deletion]
+                else:
+                    entry.discard(word)
+                    if len(entry) == 1:
+                        self.deletes[deletion] = entry.pop()
+
+    def update(self, contact_id, name_key, phone_digits=None):
+        self.remove(contact_id)
+        self.add(contact_id, name_key)
+
+    def similar_words(self, query):
+        # word -> edit distance, for indexed words close enough to query.
+        # Short words allow a single edit, or "jo" would match everything.
+        limit = 1 if len(query) <= 4 else self.MAX_DISTANCE
+        found = {}
+        for deletion in self.deletions(query):
+            entry = self.deletes.get(deletion)
+            if entry is None:
+                continue
+            for word in (entry,) if isinstance(entry, str) else entry:
+                if word not in found:
+                    found[word] = edit_distance(query, word, limit)
+        return {word: distance for word, distance in found.items() if distance <= limit}
+
+    def search(self, text, cancelled=None):
+        # Ids whose name has a close match for every query word, best first:
+        # ranked by total edit distance, then by name
+        scores = None
+        for query in self.WORDS.findall(text.lower()):
+            best = {}
+            for word, distance in self.similar_words(query).items():
+                for cid in self.postings[word]:
+                    if distance < best.get(cid, self.MAX_DISTANCE + 1):
+                        best[cid] = distance
+            if cancelled is not None and cancelled():
+                raise SearchCancelled
+            if scores is None:
+                scores = best
+            else:
+                scores = {cid: score + best[cid] for cid, score in scores.items() if cid in best}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return sorted(scores, key=lambda cid: (scores[cid], self.names[cid], cid))
+
+
+class PhoneTrie:
+    # Path-compressed trie over normalized phone digits. Lookups walk one
+    # node per shared prefix, so exact and prefix lookups cost O(length of
+    # the number) regardless of how many contacts there are. Compressing
+    # single-child chains, and only allocating children/ids when a node
+    # needs them, keeps memory to a few small objects per stored number.
+    class Node:
+        __slots__ = ("label", "children", "ids")
+
+        def __init__(self, label, ids=None):
+            self.label = label     # digits on the edge leading to this node
+            self.children = None   # first digit of child label -> Node
+            self.ids = ids         # list of contacts whose number ends here
+
+    def __init__(self):
+        self.root = self.Node("")
+
+    def add(self, digits, contact_id):
+        # Adding an id a number already holds changes nothing, as a trie
+        # built mid-import already has the rows not yet registered
+        node, pos, end = self.root, 0, len(digits)
+        while pos < end:
+            first = digits[pos]
+            child = node.children.get(first) if node.children else None
+            if child is None:
+                if node.children is None:
+                    node.children = {}
+                node.children[first] = self.Node(digits[pos:], [contact_id])
+                return
+            label = child.label
+            if digits.startswith(label, pos):
+                node = child
+                pos += len(label)
+                continue
+            # Split the edge where the new number branches off
+            common = 1
+            while pos + common < end and label[common] == digits[pos + common]:
+                common += 1
+            middle = self.Node(label[:common])
+            child.label = label[common:]
+            middle.children = {child.label[0]: child}
+            node.children[first] = middle
+            node = middle
+            pos += common
+        if node.ids is None:
+            node.ids = [contact_id]
+        elif contact_id not in node.ids:
+            node.ids.append(contact_id)
+
+    def remove(self, digits, contact_id):
+        path = [self.root]
+        rest = digits
+        while rest:
+            children = path[-1].children
+            child = children.get(rest[0]) if children else None
+            if child is None or not rest.startswith(child.label):
+                return
+            path.append(child)
+            rest = rest[len(child.label):]
+        node = path[-1]
+        if not node.ids or contact_id not in node.ids:
+            return
+        node.ids.remove(contact_id)
+        if not node.ids:
+            node.ids = None
+
+        # Prune the emptied node and re-compress its parent chain
+        while len(path) > 1 and node.ids is None and len(node.children or ()) <= 1:
+            parent = path[-2]
+            if node.children:
+                (only,) = node.children.values()
+                only.label = node.label + only.label
+                parent.children[node.label[0]] = only
+                break
+            del parent.children[node.label[0]]
+            if not parent.children:
+                parent.children = None
+            path.pop()
+            node = path[-1]
+
+    def find(self, digits):
+        # Ids whose normalized number is exactly `digits`
+        node, exact = self.locate(digits)
+        return list(node.ids) if exact and node.ids else []
+
+    def prefix(self, digits):
+        # Ids whose normalized number starts with `digits`
+        node, _ = self.locate(digits)
+        ids = []
+        stack = [node] if node is not None else []
+        while stack:
+            node = stack.pop()
+            if node.ids:
+                ids.extend(node.ids)
+            if node.children:
+                stack.extend(node.children.values())
+        return ids
+
+    def locate(self, digits):
+        # The node `digits` leads to, and whether it ends exactly there
+        # rather than partway along the node's edge
+        node, rest = self.root, digits
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None:
+                return None, False
+            if rest.startswith(child.label):
+                node, rest = child, rest[len(child.label):]
+            elif child.label.startswith(rest):
+                return child, False
+            else:
+                return None, False
+        return node, True
+
+
+class SortedIndex:
+    # (key, id) pairs kept in order with bisect: inserts and deletes are a
+    # binary search plus one list shift, and any position is read directly,
+    # so a sorted view never needs a full sort.
+    def __init__(self, entries=()):
+        self.entries = sorted(entries)
+        self.keys = {cid: key for key, cid in self.entries}
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Ids already filed are skipped: an index built from the table while an
+    # import runs already holds the batches committed but not yet registered
+    def add(self, contact_id, key):
+        if contact_id in self.keys:
+            return
+        insort(self.entries, (key, contact_id))
+        self.keys[contact_id] = key
+
+    def add_many(self, pairs):
+        # Timsort merges the already-sorted list with the new run in
+        # roughly linear time, far cheaper than one insort per row
+        keys = self.keys
+        pairs = [(cid, key) for cid, key in pairs if cid not in keys]
+        self.entries.extend((key, cid) for cid, key in pairs)
+        self.entries.sort()
+        self.keys.update(pairs)
+
+    def remove(self, contact_id):
+        key = self.keys.pop(contact_id, None)
+        if key is None:
+            return
+        pos = bisect_left(self.entries, (key, contact_id))
+        del self.entries[pos]
+
+    def remove_many(self, contact_ids):
+        # One linear filter instead of a list shift per id
+        self.entries[:] = [entry for entry in self.entries if entry[1] not in contact_ids]
+        for cid in contact_ids:
+            self.keys.pop(cid, None)
+
+    def order(self, contact_ids, reverse=False):
+        # Puts a subset of ids in index order: sort a small subset by key,
+        # walk the index for a large one. Either way ids not filed yet, from
+        # an import batch committed but not registered, are left out.
+        keys = self.keys
+        if len(contact_ids) * max(1, len(contact_ids).bit_length()) < len(self.entries):
+            filed = [cid for cid in contact_ids if cid in keys]
+            return sorted(filed, key=lambda cid: (keys[cid], cid), reverse=reverse)
+        wanted = set(contact_ids)
+        entries = reversed(self.entries) if reverse else self.entries
+        return [cid for _, cid in entries if cid in wanted]
+
+
+class SortedView:
+    # Read-only sequence of the ids in a SortedIndex, in either direction,
+    # without copying the index
+    def __init__(self, index, reverse=False):
+        self.index = index
+        self.reverse = reverse
+
+    def __len__(self):
+        return len(self.index.entries)
+
+    def __getitem__(self, item):
+        entries = self.index.entries
+        size = len(entries)
+        if isinstance(item, slice):
+            start, stop, _ = item.indices(size)
+            if self.reverse:
+                return [entries[size - 1 - i][1] for i in range(start, stop)]
+            return [cid for _, cid in entries[start:stop]]
+        if item < 0:
+            item += size
+        return entries[size - 1 - item][1] if self.reverse else entries[item][1]
+
+
+class ContactStore:
+    # Contacts persisted in SQLite (WAL mode). Ids come from an
+    # AUTOINCREMENT primary key, so they survive restarts and are never
+    # reused. Only the id list is read at startup; records are fetched on
+    # demand into an id -> record cache and each search index is built on
+    # the first search that needs it.
+    #
+    # search() may run on a worker thread. It never touches self.conn, and
+    # the search and sort indexes are guarded by index_lock; every other
+    # method belongs to the Tk thread.
+    SCHEMA_VERSION = 1
+    SORT_COLUMNS = ("name", "phone", "email")
+    TEXT_INDEXES = {"substring": TrigramIndex, "fuzzy": FuzzyIndex}
+
+    def __init__(self, db_name="contacts.db"):
+        self.db_name = db_name
+        self.conn = sqlite3.connect(db_name)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.migrate()
+
+        self.cache = {}  # id -> Contact
+        self.ids = [row[0] for row in self.conn.execute("SELECT id FROM contacts ORDER BY id")]
+        self.text_indexes = {}    # kind -> built TrigramIndex / FuzzyIndex
+        self.index_backlogs = {}  # kind -> changes made while it is being built
+        self.index_lock = threading.Lock()
+        self.sort_indexes = {}  # column -> SortedIndex, built on first use
+        self.phone_trie = None  # PhoneTrie, built on first use
+
+    def migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        with self.conn:
+            if version < 1:
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS contacts ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "name TEXT NOT NULL, "
+                    "phone TEXT NOT NULL, "
+                    "email TEXT NOT NULL DEFAULT '', "
+                    "address TEXT NOT NULL DEFAULT '')"
+                )
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---- Reads ----
+    def get(self, contact_id):
+        contact = self.cache.get(contact_id)
+        if contact is None:
+            row = self.conn.execute(
+                "SELECT id, name, phone, email, address FROM contacts WHERE id = ?",
+                (contact_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            contact = self.cache[contact_id] = Contact(*row)
+        return contact
+
+    def get_many(self, contact_ids):
+        missing = [cid for cid in contact_ids if cid not in self.cache]
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            rows = self.conn.execute(
+                f"SELECT id, name, phone, email, address FROM contacts WHERE id IN ({placeholders})",
+                missing,
+            )
+            for row in rows:
+                self.cache[row[0]] = Contact(*row)
+        # Ids deleted after a background search ran are skipped
+        return [self.cache[cid] for cid in contact_ids if cid in self.cache]
+
+    def search(self, text, cancelled=None, order=None, fuzzy=False):
+        # `order` is a (column, reverse) pair whose sort index already
+        # exists. Fuzzy results come ranked by closeness and ignore it.
+        kind = "fuzzy" if fuzzy else "substring"
+        index = self.text_indexes.get(kind) or self.build_text_index(kind)
+        with self.index_lock:
+            matches = index.search(text, cancelled)
+            if order is not None and not fuzzy:
+                column, reverse = order
+                matches = self.sort_indexes[column].order(matches, reverse)
+            return matches
+
+    def phone_index(self):
+        if self.phone_trie is None:
+            trie = PhoneTrie()
+            # The trie holds no reference cycles; pausing the cyclic GC while
+            # millions of nodes are allocated halves the build time
+            gc.disable()
+            try:
+                for contact_id, phone in self.conn.execute("SELECT id, phone FROM contacts"):
+                    digits = normalize_phone(phone)
+                    if digits:
+                        trie.add(digits, contact_id)
+            finally:
+                gc.enable()
+            self.phone_trie = trie
+        return self.phone_trie
+
+    def find_by_phone(self, phone, exclude=None):
+        # Ids of other contacts whose number normalizes to the same digits
+        digits = normalize_phone(phone)
+        if not digits:
+            return []
+        return [cid for cid in self.phone_index().find(digits) if cid != exclude]
+
+    def phone_change(self, contact_id, old_digits, new_digits):
+        if self.phone_trie is None or old_digits == new_digits:
+            return
+        if old_digits:
+            self.phone_trie.remove(old_digits, contact_id)
+        if new_digits:
+            self.phone_trie.add(new_digits, contact_id)
+
+    def sorted_view(self, column, reverse=False):
+        if column not in self.SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {column!r}")
+        if column not in self.sort_indexes:
+            rows = self.conn.execute(f"SELECT id, {column} FROM contacts")
+            index = SortedIndex((value.lower(), cid) for cid, value in rows)
+            with self.index_lock:
+                self.sort_indexes[column] = index
+        return SortedView(self.sort_indexes[column], reverse)
+
+    def sort_change(self, contact_id, contact=None):
+        # Re-files contact_id in every built sort index; None removes it
+        with self.index_lock:
+            for column, index in self.sort_indexes.items():
+                index.remove(contact_id)
+                if contact is not None:
+                    index.add(contact_id, getattr(contact, column).lower())
+
+    def build_text_index(self, kind):
+        # Reads through a connection of its own, so that a worker thread can
+        # build the index while the Tk thread keeps writing. Writes made in
+        # the meantime are queued in index_backlogs and replayed at the end;
+        # replaying a change the snapshot already contains is harmless.
+        with self.index_lock:
+            if kind in self.text_indexes:
+                return self.text_indexes[kind]
+            self.index_backlogs[kind] = []
+
+        index = self.TEXT_INDEXES[kind]()
+        conn = sqlite3.connect(self.db_name)
+        try:
+            for contact_id, name, phone in conn.execute("SELECT id, name, phone FROM contacts"):
+                index.add(contact_id, name.lower(), normalize_phone(phone))
+        finally:
+            conn.close()
+
+        with self.index_lock:
+            for method, args in self.index_backlogs.pop(kind):
+                getattr(index, method)(*args)
+            self.text_indexes[kind] = index
+        return index
+
+    def index_change(self, method, *args):
+        self.index_change_many(method, [args])
+
+    def index_change_many(self, method, arg_tuples):
+        # Applies one kind of change to every text index under a single lock
+        with self.index_lock:
+            if not self.text_indexes and not self.index_backlogs:
+                return
+            arg_tuples = list(arg_tuples)
+            for index in self.text_indexes.values():
+                apply = getattr(index, method)
+                for args in arg_tuples:
+                    apply(*args)
+            for backlog in self.index_backlogs.values():
+                backlog.extend((method, args) for args in arg_tuples)
+
+    # ---- Writes ----
+    def add(self, name, phone, email, address):
+        name, phone, email, address = validate_contact(name, phone, email, address)
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO contacts (name, phone, email, address) VALUES (?, ?, ?, ?)",
+                (name, phone, email, address),
+            )
+        contact = Contact(cursor.lastrowid, name, phone, email, address)
+        self.cache[contact.id] = contact
+        self.ids.append(contact.id)
+        self.index_change("add", contact.id, contact.name_key, contact.phone_digits)
+        self.sort_change(contact.id, contact)
+        self.phone_change(contact.id, "", contact.phone_digits)
+        return contact
+
+    def update(self, contact_id, name, phone, email, address):
+        name, phone, email, address = validate_contact(name, phone, email, address)
+        old = self.get(contact_id) if self.phone_trie is not None else None
+        with self.conn:
+            self.conn.execute(
+                "UPDATE contacts SET name = ?, phone = ?, email = ?, address = ? WHERE id = ?",
+                (name, phone, email, address, contact_id),
+            )
+        contact = self.cache[contact_id] = Contact(contact_id, name, phone, email, address)
+        self.index_change("update", contact_id, contact.name_key, contact.phone_digits)
+        self.sort_change(contact_id, contact)
+        if old is not None:
+            self.phone_change(contact_id, old.phone_digits, contact.phone_digits)
+
+    def delete(self, contact_id):
+        old = self.get(contact_id) if self.phone_trie is not None else None
+        with self.conn:
+            self.conn.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+        self.cache.pop(contact_id, None)
+        # ids stay sorted, so the position is found by bisection
+        pos = bisect_left(self.ids, contact_id)
+        if pos < len(self.ids) and self.ids[pos] == contact_id:
+            del self.ids[pos]
+        self.index_change("remove", contact_id)
+        self.sort_change(contact_id)
+        if old is not None:
+            self.phone_change(contact_id, old.phone_digits, "")
+
+    def merge_duplicates(self):
+        # Merges contacts whose phone numbers normalize to the same digits in
+        # one streaming pass: the oldest contact is kept, empty email and
+        # address fields are filled in from its duplicates, and the
+        # duplicates are deleted. Returns the number of contacts removed.
+        keepers = {}     # digits -> [id, email, address, changed]
+        duplicates = []  # (id, digits) to delete
+        rows = self.conn.execute("SELECT id, phone, email, address FROM contacts ORDER BY id")
+        for contact_id, phone, email, address in rows:
+            digits = normalize_phone(phone)
+            if not digits:
+                continue
+            keeper = keepers.get(digits)
+            if keeper is None:
+                keepers[digits] = [contact_id, email, address, False]
+                continue
+            duplicates.append((contact_id, digits))
+            if email and not keeper[1]:
+                keeper[1], keeper[3] = email, True
+            if address and not keeper[2]:
+                keeper[2], keeper[3] = address, True
+
+        if not duplicates:
+            return 0
+
+        changed = [(email, address, cid) for cid, email, address, dirty in keepers.values() if dirty]
+        del keepers
+        with self.conn:
+            self.conn.executemany("UPDATE contacts SET email = ?, address = ? WHERE id = ?", changed)
+            self.conn.executemany("DELETE FROM contacts WHERE id = ?", ((cid,) for cid, _ in duplicates))
+
+        # Rebuild the in-memory structures with linear filters rather than
+        # one list shift per removed id
+        removed = {cid for cid, _ in duplicates}
+        for _, _, cid in changed:
+            self.cache.pop(cid, None)
+            if self.sort_indexes:
+                # A filled-in email moves the keeper in the email sort
+                self.sort_change(cid, self.get(cid))
+        for cid in removed:
+            self.cache.pop(cid, None)
+        self.ids[:] = [cid for cid in self.ids if cid not in removed]
+        self.index_change_many("remove", ((cid,) for cid in removed))
+        with self.index_lock:
+            for index in self.sort_indexes.values():
+                index.remove_many(removed)
+        if self.phone_trie is not None:
+            for cid, digits in duplicates:
+                self.phone_trie.remove(digits, cid)
+        return len(duplicates)
+
+    # ---- Bulk import / export ----
+    def import_batches(self, path, batch_size=10000):
+        # Streams `path` in batches of `batch_size` rows, each inserted in
+        # one transaction, and yields (rows, skipped, fraction_done) per
+        # batch. Rows are (id, name, phone, email, address) tuples and must
+        # be passed to register_imported() on the Tk thread. Uses its own
+        # connection, so it can run on a worker thread.
+        read = contact_format(path)[0]
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                size = os.fstat(f.fileno()).st_size or 1
+                records = read(f)
+                while True:
+                    chunk = list(islice(records, batch_size))
+                    if not chunk:
+                        break
+                    valid = [record for record in chunk if record[0] and record[1]]
+
+                    # Ids are assigned here rather than by SQLite so the
+                    # caller learns them without reading the rows back.
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        seq = conn.execute(
+                            "SELECT seq FROM sqlite_sequence WHERE name = 'contacts'"
+                        ).fetchone()
+                        first_id = (seq[0] if seq else 0) + 1
+                        rows = [(first_id + i,) + record for i, record in enumerate(valid)]
+                        conn.executemany(
+                            "INSERT INTO contacts (id, name, phone, email, address) VALUES (?, ?, ?, ?, ?)",
+                            rows,
+                        )
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                    yield rows, len(chunk) - len(valid), min(1.0, f.buffer.tell() / size)
+        finally:
+            conn.close()
+
+    def register_imported(self, rows):
+        # One id-list extension and one index update for the whole batch
+        ids = [row[0] for row in rows]
+        if ids and self.ids and ids[0] < self.ids[-1]:
+            # A contact added from the form landed between two batches
+            self.ids.extend(ids)
+            self.ids.sort()
+        else:
+            self.ids.extend(ids)
+
+        self.index_change_many(
+            "add",
+            ((contact_id, name.lower(), normalize_phone(phone)) for contact_id, name, phone, _, _ in rows),
+        )
+        with self.index_lock:
+            for column, index in self.sort_indexes.items():
+                position = CONTACT_FIELDS.index(column) + 1
+                index.add_many((row[0], row[position].lower()) for row in rows)
+
+        if self.phone_trie is not None:
+            for contact_id, _, phone, _, _ in rows:
+                digits = normalize_phone(phone)
+                if digits:
+                    self.phone_trie.add(digits, contact_id)
+
+    def import_file(self, path, batch_size=10000):
+        # Synchronous import for scripts; returns (imported, skipped)
+        imported = skipped = 0
+        for rows, batch_skipped, _ in self.import_batches(path, batch_size):
+            self.register_imported(rows)
+            imported += len(rows)
+            skipped += batch_skipped
+        return imported, skipped
+
+    def export_file(self, path):
+        # Streams every contact to `path`; safe to call from a worker thread
+        write = contact_format(path)[1]
+        conn = sqlite3.connect(self.db_name)
+        try:
+            rows = conn.execute("SELECT name, phone, email, address FROM contacts ORDER BY id")
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                write(f, rows)
+        finally:
+            conn.close()
+
+    def close(self):
+        self.conn.close()
+
+
+# ---- Import / export formats ----
+# Readers take an open text file and yield (name, phone, email, address)
+# tuples lazily; writers take an open text file and an iterable of them.
+CONTACT_FIELDS = ("name", "phone", "email", "address")
+
+
+def read_csv(f):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column.strip().lower() for column in header]
+    positions = [columns.index(field) if field in columns else None for field in CONTACT_FIELDS]
+    for row in reader:
+        yield tuple(
+            row[pos].strip() if pos is not None and pos < len(row) else ""
+            for pos in positions
+        )
+
+
+def write_csv(f, rows):
+    writer = csv.writer(f)
+    writer.writerow(CONTACT_FIELDS)
+    writer.writerows(rows)
+
+
+def read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        yield tuple(str(record.get(field) or "").strip() for field in CONTACT_FIELDS)
+
+
+def write_jsonl(f, rows):
+    for row in rows:
+        f.write(json.dumps(dict(zip(CONTACT_FIELDS, row)), ensure_ascii=False))
+        f.write("\n")
+
+
+def vcard_unescape(value):
+    # "\n" is a newline; any other escaped character stands for itself
+    if "\\" not in value:
+        return value
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def vcard_escape(value):
+    return (
+        value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+        .replace("\r\n", "\n").replace("\n", "\\n")
+    )
+
+
+def vcard_lines(f):
+    # Undo RFC 6350 line folding: a line starting with a space or tab
+    # continues the previous one
+    current = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def read_vcard(f):
+    card = None
+    for line in vcard_lines(f):
+        prop, _, value = line.partition(":")
+        # "item1.TEL;TYPE=cell" -> "TEL"
+        key = prop.split(";")[0].rsplit(".", 1)[-1].upper()
+        if key == "BEGIN" and value.strip().upper() == "VCARD":
+            card = {}
+        elif card is None:
+            continue
+        elif key == "END":
+            name = card.get("FN") or card.get("N", "")
+            yield name, card.get("TEL", ""), card.get("EMAIL", ""), card.get("ADR", "")
+            card = None
+        elif key in ("FN", "TEL", "EMAIL"):
+            card.setdefault(key, vcard_unescape(value).strip())
+        elif key in ("N", "ADR"):
+            parts = [vcard_unescape(part).strip() for part in re.split(r"(?<!\\);", value)]
+            if key == "N":
+                # Family;Given;Additional;Prefix;Suffix -> "Given Family"
+                parts = parts[1:2] + parts[0:1]
+                card.setdefault(key, " ".join(part for part in parts if part))
+            else:
+                card.setdefault(key, "\n".join(part for part in parts if part))
+
+
+def write_vcard(f, rows):
+    for name, phone, email, address in rows:
+        f.write("BEGIN:VCARD\r\nVERSION:3.0\r\n")
+        f.write(f"FN:{vcard_escape(name)}\r\n")
+        f.write(f"TEL:{vcard_escape(phone)}\r\n")
+        if email:
+            f.write(f"EMAIL:{vcard_escape(email)}\r\n")
+        if address:
+            f.write(f"ADR:;;{vcard_escape(address)};;;;\r\n")
+        f.write("END:VCARD\r\n")
+
+
+CONTACT_FORMATS = {
+    ".csv": (read_csv, write_csv),
+    ".jsonl": (read_jsonl, write_jsonl),
+    ".ndjson": (read_jsonl, write_jsonl),
+    ".vcf": (read_vcard, write_vcard),
+    ".vcard": (read_vcard, write_vcard),
+}
+
+
+def contact_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in CONTACT_FORMATS:
+        raise ValueError(f"Unsupported file type: {extension or path}")
+    return CONTACT_FORMATS[extension]
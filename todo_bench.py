@@ -0,0 +1,676 @@
+# Benchmarks for TaskDatabase in To-do-list.py. Nothing here needs a display.
+#
+#     python todo_bench.py --tasks 100000
+#     python todo_bench.py --only lookup --tasks 300000
+#     python todo_bench.py --only model --sizes 10000 100000 1000000
+#     python todo_bench.py --only view --sizes 50000
+#     python todo_bench.py --only startup --sizes 10000 100000 1000000
+#     python todo_bench.py --only stress --clicks 5000
+#     python todo_bench.py --only search --tasks 1000000
+#     python todo_bench.py --only filter --tasks 1000000
+#     python todo_bench.py --only sync --writers 4 --clicks 2000
+#     python todo_bench.py --only undo --sizes 10000 100000 1000000
+#
+# The stress run drives TaskManager on a stand-in event loop, with I/O
+# latency injected into the database and the status filter switched now
+# and then (a reload), and exits with status 1 if any
+# callback holds the loop longer than the frame budget. The sync run has
+# writer processes share the database with such a TaskManager and exits
+# with status 1 if its list ends up different from the database.
+import argparse
+import heapq
+import importlib.util
+import itertools
+import multiprocessing
+import os
+import random
+import sqlite3 as sql
+import sys
+import tempfile
+import time
+
+
+def load_todo():
+    # The script name has hyphens, so it cannot be imported normally
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "To-do-list.py")
+    spec = importlib.util.spec_from_file_location("todo_list", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CommitPerTask:
+    # The TaskDatabase write path before group commit: default journal,
+    # one commit (and fsync) per task.
+    def __init__(self, db_name):
+        self.conn = sql.connect(db_name)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS tasks (title TEXT, completed INTEGER)')
+
+    def add_task(self, task):
+        self.conn.execute('INSERT INTO tasks (title, completed) VALUES (?, ?)', (task, 0))
+        self.conn.commit()
+
+    def add_tasks(self, tasks):
+        with self.conn:
+            self.conn.executemany('INSERT INTO tasks (title, completed) VALUES (?, 0)', ((t,) for t in tasks))
+
+    def has_task(self, task):
+        return self.conn.execute('SELECT 1 FROM tasks WHERE title = ?', (task,)).fetchone() is not None
+
+    def delete_task(self, task):
+        self.conn.execute('DELETE FROM tasks WHERE title = ?', (task,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_writes(count, sample):
+    todo = load_todo()
+    titles = [f"Task number {i}" for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        old = CommitPerTask(os.path.join(tmp, "old.db"))
+        per_task = timed(lambda: [old.add_task(t) for t in titles[:sample]]) / sample
+        old.close()
+
+        db = todo.TaskDatabase(os.path.join(tmp, "grouped.db"))
+        grouped = timed(lambda: ([db.add_task(t) for t in titles], db.flush()))
+        db.close()
+
+        db = todo.TaskDatabase(os.path.join(tmp, "bulk.db"))
+        bulk = timed(lambda: db.add_tasks(titles))
+        assert len(db.get_tasks()) == count
+        db.close()
+
+    print(f"{count} tasks")
+    print(f"  commit per task   {per_task * count:>8.2f} s  (extrapolated from {sample})")
+    print(f"  add_task grouped  {grouped:>8.2f} s")
+    print(f"  add_tasks bulk    {bulk:>8.2f} s")
+
+
+def bench_lookup(count, sample):
+    # Per-operation cost of has_task and delete_task on a table of count rows
+    todo = load_todo()
+    titles = [f"Task number {i}" for i in range(count)]
+    probes = titles[::max(count // sample, 1)][:sample]
+    print(f"{count} tasks, {len(probes)} lookups and deletes")
+    print(f"  {'schema':<18} {'lookup ms':>10} {'delete ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, db in (
+            ("unindexed (v0)", CommitPerTask(os.path.join(tmp, "old.db"))),
+            ("title index (v1)", todo.TaskDatabase(os.path.join(tmp, "new.db"))),
+        ):
+            db.add_tasks(titles)
+            lookup = timed(lambda: [db.has_task(t) for t in probes]) / len(probes)
+            delete = timed(lambda: [db.delete_task(t) for t in probes]) / len(probes)
+            db.close()
+            print(f"  {label:<18} {lookup * 1000:>10.4f} {delete * 1000:>10.4f}")
+
+
+class ListModel:
+    # The list TaskManager kept before TaskList
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, task_id, title):
+        self.tasks.append(title)
+
+    def remove(self, title):
+        self.tasks.remove(title)
+
+    def __contains__(self, title):
+        return title in self.tasks
+
+
+def bench_model(sizes, ops):
+    # Per-operation cost of the in-memory model: a duplicate check that
+    # misses, an add, and removing a task from the middle of the list
+    todo = load_todo()
+    print(f"{'tasks':>10} {'model':>9} {'contains us':>12} {'add us':>8} {'remove us':>10}")
+    for size in sizes:
+        titles = [f"Task number {i}" for i in range(size)]
+        extra = [f"New task {i}" for i in range(ops)]
+        middle = titles[size // 2:size // 2 + ops]
+        for label, model in (("list", ListModel()), ("TaskList", todo.TaskList())):
+            for task_id, title in enumerate(titles):
+                model.add(task_id, title)
+            contains = timed(lambda: [t in model for t in extra]) / ops
+            add = timed(lambda: [model.add(size + i, t) for i, t in enumerate(extra)]) / ops
+            remove = timed(lambda: [model.remove(t) for t in middle]) / ops
+            print(
+                f"{size:>10} {label:>9} {contains * 1e6:>12.3f} {add * 1e6:>8.3f} {remove * 1e6:>10.3f}"
+            )
+
+
+FRAME_BUDGET = 1 / 60
+
+
+class CountingListbox:
+    # Stands in for a Tk Listbox without a display: keeps the lines and
+    # counts the widget calls made on it
+    def __init__(self):
+        self.lines = []
+        self.calls = 0
+
+    def insert(self, index, *items):
+        self.calls += 1
+        at = len(self.lines) if index == 'end' else index
+        self.lines[at:at] = items
+
+    def delete(self, first, last=None):
+        self.calls += 1
+        if last == 'end':
+            del self.lines[first:]
+        else:
+            del self.lines[first:(first if last is None else last) + 1]
+
+
+class SelectableListbox(CountingListbox):
+    def __init__(self):
+        super().__init__()
+        self.selection = None
+
+    def curselection(self):
+        return () if self.selection is None else (self.selection,)
+
+    def selection_set(self, first, last=None):
+        self.calls += 1
+        self.selection = first
+
+
+class Field:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def delete(self, first, last=None):
+        self.value = ""
+
+
+class Messages:
+    # Replaces tkinter.messagebox: records what would have been shown
+    def __init__(self):
+        self.shown = []
+
+    def showinfo(self, title, message):
+        self.shown.append(message)
+
+    showerror = showinfo
+
+    def askyesno(self, title, message):
+        return True
+
+
+class HeadlessRoot:
+    # Enough of a Tk root for TaskManager: a single-threaded after() loop
+    # that records how long each callback holds it
+    def __init__(self):
+        self.timers = []
+        self.order = itertools.count()
+        self.stalls = []
+
+    def after(self, ms, func):
+        heapq.heappush(self.timers, (time.perf_counter() + ms / 1000, next(self.order), func))
+
+    def run(self, until, timeout):
+        give_up = time.perf_counter() + timeout
+        while not until() and time.perf_counter() < give_up:
+            if not self.timers:
+                time.sleep(0.001)
+                continue
+            due, _, func = heapq.heappop(self.timers)
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            start = time.perf_counter()
+            func()
+            self.stalls.append(time.perf_counter() - start)
+
+    def noop(self, *args, **kwargs):
+        pass
+
+    title = geometry = resizable = configure = protocol = update_idletasks = destroy = noop
+
+
+def headless_manager(todo):
+    # TaskManager with stand-ins for its widgets, to run on a HeadlessRoot
+    class HeadlessTaskManager(todo.TaskManager):
+        def create_widgets(self):
+            self.task_field = Field()
+            self.search_field = Field()
+            self.filter_var = Field("All")
+            self.task_listbox = SelectableListbox()
+
+    return HeadlessTaskManager
+
+
+def slow_database(todo, latency, spike, spike_every, fail_every):
+    # TaskDatabase with injected I/O latency, occasional long stalls (a
+    # slow disk or a locked file) and occasional failed deletes
+    calls = itertools.count(1)
+
+    class SlowTaskDatabase(todo.TaskDatabase):
+        def stall(self):
+            n = next(calls)
+            time.sleep(spike if n % spike_every == 0 else latency)
+            return n
+
+        def add_task(self, task):
+            self.stall()
+            return super().add_task(task)
+
+        def delete_task(self, task):
+            if self.stall() % fail_every == 0:
+                raise sql.OperationalError("injected failure")
+            super().delete_task(task)
+
+        def get_tasks_page(self, after_id=0, limit=1000, completed=None):
+            self.stall()
+            return super().get_tasks_page(after_id, limit, completed)
+
+    return SlowTaskDatabase
+
+
+def bench_stress(ops, preload, latency, spike):
+    todo = load_todo()
+    todo.messagebox = messages = Messages()
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        db = todo.TaskDatabase(path)
+        db.add_tasks(f"Old task {i}" for i in range(preload))
+        db.close()
+
+        root = HeadlessRoot()
+        db_class = slow_database(todo, latency, spike, spike_every=500, fail_every=97)
+        manager = headless_manager(todo)(root, path, db_class)
+        issued = 0
+
+        def click():
+            nonlocal issued
+            issued += 1
+            n = issued
+            lines = manager.view.line_ids
+            action = rng.random()
+            if n == ops or action < 0.01:
+                # A reload from the event loop; back to All for the check
+                manager.filter_var.value = "All" if n == ops else rng.choice(list(manager.FILTERS))
+                manager.filter_changed()
+            elif action < 0.6 or not lines:
+                manager.task_field.value = f"New task {n}"
+                manager.add_task()
+            elif action < 0.8:
+                manager.task_listbox.selection = rng.randrange(len(lines))
+                manager.toggle_task()
+            else:
+                manager.task_listbox.selection = rng.randrange(len(lines))
+                manager.delete_task()
+            if n < ops:
+                root.after(1, click)
+
+        root.after(0, click)
+        start = time.perf_counter()
+        root.run(lambda: issued >= ops and not manager.worker.outstanding, timeout=600)
+        elapsed = time.perf_counter() - start
+        manager.close()
+
+        db = todo.TaskDatabase(path)
+        rows = db.get_tasks()
+        db.close()
+
+    stored = [row[1] for row in rows]
+    shown = [manager.tasks.titles[task_id] for task_id in manager.view.line_ids]
+    consistent = (
+        sorted(stored) == sorted(shown) == sorted(manager.tasks)
+        and {row[0] for row in rows if row[2]} == manager.tasks.done
+        and manager.task_listbox.lines == [manager.tasks.label(i) for i in manager.view.line_ids]
+        and min(manager.view.line_ids, default=0) >= 0
+    )
+    stalls = sorted(root.stalls)
+    worst = stalls[-1]
+    print(f"{ops} adds, toggles and removes on {preload} tasks in {elapsed:.1f} s, "
+          f"{latency * 1000:.1f} ms per call, {spike * 1000:.0f} ms every 500th")
+    print(f"  event loop callbacks  {len(stalls)}")
+    print(f"  p99 / max stall       {stalls[len(stalls) * 99 // 100] * 1000:.2f} / {worst * 1000:.2f} ms"
+          f" (budget {FRAME_BUDGET * 1000:.1f} ms)")
+    print(f"  rolled back           {len(messages.shown)} (injected delete failures)")
+    print(f"  model, view and database agree: {consistent}")
+    return consistent and worst <= FRAME_BUDGET
+
+
+def sync_writer(path, writer, ops, results):
+    # Another instance: adds tasks stamped with the time they were
+    # committed, and toggles and deletes some of its own, one commit each
+    todo = load_todo()
+    db = todo.TaskDatabase(path, batch_size=1)
+    rng = random.Random(writer)
+    mine, errors = [], 0
+    start = time.perf_counter()
+    for n in range(ops):
+        try:
+            action = rng.random()
+            if action < 0.7 or not mine:
+                title = f"w{writer} {n} {time.time():.6f}"
+                if db.add_task(title) is not None:
+                    mine.append(title)
+            elif action < 0.9:
+                db.set_completed(rng.choice(mine), rng.random() < 0.5)
+            else:
+                db.delete_task(mine.pop(rng.randrange(len(mine))))
+        except sql.OperationalError:
+            errors += 1
+    elapsed = time.perf_counter() - start
+    db.close()
+    results.put((ops, errors, elapsed))
+
+
+def bench_sync(writers, ops, interval):
+    # Sync latency: from a writer's commit until the add reaches the
+    # headless TaskManager's list
+    todo = load_todo()
+    todo.messagebox = Messages()
+    latencies = []
+
+    class SyncedTaskManager(headless_manager(todo)):
+        SYNC_INTERVAL = interval
+
+        def apply_change(self, op, task_id, task, completed):
+            if op == 'add' and task is not None and task.startswith("w"):
+                latencies.append(time.time() - float(task.rsplit(" ", 1)[1]))
+            super().apply_change(op, task_id, task, completed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sync.db")
+        todo.TaskDatabase(path).close()
+        root = HeadlessRoot()
+        manager = SyncedTaskManager(root, path)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=sync_writer, args=(path, writer, ops, results))
+            for writer in range(writers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        root.run(lambda: not any(process.is_alive() for process in processes), timeout=600)
+        elapsed = time.perf_counter() - start
+        # Let the last changes arrive
+        db = todo.TaskDatabase(path)
+        latest = db.latest_change()
+        root.run(lambda: manager.change_seq >= latest and not manager.worker.outstanding, timeout=60)
+        rows = db.get_tasks()
+        db.close()
+        manager.close()
+
+    done = [results.get() for _ in processes]
+    total = sum(d[0] for d in done)
+    errors = sum(d[1] for d in done)
+    consistent = (
+        sorted(row[1] for row in rows) == sorted(manager.tasks)
+        and {row[0] for row in rows if row[2]} == manager.tasks.done
+        and manager.task_listbox.lines == [manager.tasks.label(i) for i in manager.view.line_ids]
+    )
+    latencies.sort()
+    print(f"{writers} writer processes x {ops} ops, polled every {interval} ms")
+    print(f"  throughput            {total / elapsed:.0f} ops/s, {errors} lock errors")
+    print(f"  sync latency p50/p99  {latencies[len(latencies) // 2] * 1000:.0f} / "
+          f"{latencies[len(latencies) * 99 // 100] * 1000:.0f} ms over {len(latencies)} adds")
+    print(f"  list matches the database: {consistent}")
+    return consistent and not errors
+
+
+def redraw(listbox, tasks):
+    # update_listbox before ListboxView: clear and reinsert every line
+    listbox.delete(0, 'end')
+    for task in tasks:
+        listbox.insert('end', task)
+
+
+def bench_view(sizes, ops):
+    # Listbox calls and time per single-task add, redraw vs ListboxView
+    todo = load_todo()
+    print(f"{'tasks':>10} {'update':>12} {'calls/add':>10} {'us/add':>10}")
+    for size in sizes:
+        tasks = todo.TaskList()
+        for task_id in range(size):
+            tasks.add(task_id, f"Task number {task_id}")
+        extra = [(size + i, f"New task {i}") for i in range(ops)]
+
+        listbox = CountingListbox()
+        redraw(listbox, tasks)
+        listbox.calls = 0
+        def redraw_adds():
+            for task_id, title in extra:
+                tasks.add(task_id, title)
+                redraw(listbox, tasks)
+        elapsed = timed(redraw_adds)
+        print(f"{size:>10} {'redraw':>12} {listbox.calls / ops:>10.0f} {elapsed / ops * 1e6:>10.1f}")
+        for task_id, title in extra:
+            tasks.remove(title)
+
+        listbox = CountingListbox()
+        view = todo.ListboxView(listbox)
+        view.load(tasks)
+        assert listbox.calls == 1
+        listbox.calls = 0
+        def view_adds():
+            for task_id, title in extra:
+                tasks.add(task_id, title)
+                view.append(task_id, title)
+        elapsed = timed(view_adds)
+        assert listbox.lines == list(tasks)
+        print(f"{size:>10} {'ListboxView':>12} {listbox.calls / ops:>10.0f} {elapsed / ops * 1e6:>10.1f}")
+
+
+def bench_startup(sizes):
+    # Time from opening the database to having the rows for the first
+    # screen in the model: the whole table before paging, one page after
+    todo = load_todo()
+    first_page = todo.TaskManager.FIRST_PAGE
+    print(f"{'tasks':>10} {'fetchall ms':>12} {'first page ms':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"tasks{size}.db")
+            db = todo.TaskDatabase(path)
+            db.add_tasks(f"Task number {i}" for i in range(size))
+            db.close()
+
+            def startup(load):
+                db = todo.TaskDatabase(path)
+                tasks = todo.TaskList()
+                elapsed = timed(lambda: [tasks.add(row[0], row[1]) for row in load(db)])
+                db.close()
+                return elapsed
+            full = startup(lambda db: db.get_tasks())
+            paged = startup(lambda db: db.get_tasks_page(0, first_page))
+            print(f"{size:>10} {full * 1000:>12.2f} {paged * 1000:>14.3f}")
+
+
+WORDS = [
+    "buy", "milk", "call", "mom", "write", "report", "fix", "bike", "pay",
+    "bills", "book", "flight", "clean", "garage", "review", "code", "plan",
+    "trip", "water", "plants", "email", "dentist", "renew", "passport",
+]
+SEARCHES = ["milk", "call mom", "rev co", "passp", "12345", "zzz"]
+
+
+def bench_search(count, repeat=5):
+    # Full-text search against the LIKE scan it replaces
+    todo = load_todo()
+    rng = random.Random(1)
+    titles = [f"{' '.join(rng.sample(WORDS, 3))} {i}" for i in range(count)]
+    limit = todo.TaskManager.SEARCH_LIMIT
+    with tempfile.TemporaryDirectory() as tmp:
+        db = todo.TaskDatabase(os.path.join(tmp, "search.db"))
+        load = timed(lambda: db.add_tasks(titles))
+        print(f"{count} tasks, indexed in {load:.2f} s")
+        print(f"  {'query':<10} {'results':>8} {'LIKE ms':>10} {'FTS5 ms':>10}")
+        for text in SEARCHES:
+            pattern = "%" + text.split()[0] + "%"
+            like = min(timed(lambda: db.conn.execute(
+                'SELECT id, title, completed FROM tasks WHERE title LIKE ? LIMIT ?', (pattern, limit)
+            ).fetchall()) for _ in range(repeat))
+            fts = min(timed(lambda: db.search_tasks(text, limit)) for _ in range(repeat))
+            found = len(db.search_tasks(text, limit))
+            print(f"  {text:<10} {found:>8} {like * 1000:>10.2f} {fts * 1000:>10.2f}")
+        db.close()
+
+
+def bench_filter(count, active_every=100):
+    # A long, mostly completed history: one task in active_every is active
+    todo = load_todo()
+    page = todo.TaskManager.PAGE_SIZE
+
+    def read_all(db, sql):
+        rows, after_id = [], 0
+        while True:
+            batch = db.conn.execute(sql, (after_id, page)).fetchall()
+            rows += batch
+            if len(batch) < page:
+                return rows
+            after_id = batch[-1][0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = todo.TaskDatabase(os.path.join(tmp, "filter.db"))
+        db.add_tasks(f"Task number {i}" for i in range(count))
+        # Completed two months ago, so all of them are due for archiving
+        db.conn.execute(
+            "UPDATE tasks SET completed = 1, updated_at = updated_at - 60 * 86400 WHERE id % ? != 0",
+            (active_every,)
+        )
+        db.conn.commit()
+        active = count // active_every
+        scan_sql = 'SELECT id, title, completed FROM tasks NOT INDEXED WHERE completed = 0 AND id > ? ORDER BY id LIMIT ?'
+        index_sql = 'SELECT id, title, completed FROM tasks WHERE completed = 0 AND id > ? ORDER BY id LIMIT ?'
+        scan = timed(lambda: read_all(db, scan_sql))
+        indexed = timed(lambda: read_all(db, index_sql))
+        assert len(read_all(db, index_sql)) == active
+        first = timed(lambda: db.get_tasks_page(0, todo.TaskManager.FIRST_PAGE, 0))
+
+        def archive():
+            moved = todo.TaskManager.ARCHIVE_BATCH
+            while moved == todo.TaskManager.ARCHIVE_BATCH:
+                moved = len(db.archive_completed(todo.TaskManager.ARCHIVE_AFTER, moved))
+                db.flush()
+        archived = timed(archive)
+        hot = db.conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+        db.close()
+
+    print(f"{count} tasks, {active} active")
+    print(f"  all active, rowid scan      {scan * 1000:>9.1f} ms")
+    print(f"  all active, partial index   {indexed * 1000:>9.1f} ms")
+    print(f"  first active page           {first * 1000:>9.3f} ms")
+    print(f"  archive completed           {archived:>9.2f} s, {hot} rows left in tasks")
+
+
+def bench_undo(sizes, repeat=5):
+    # Delete All, its undo and redo against snapshotting the table, then
+    # single edits; the journal has to survive reopening the file, and
+    # belongs to the instance that made the edits
+    todo = load_todo()
+    print(f"{'tasks':>10} {'snapshot ms':>12} {'delete all ms':>14} {'undo ms':>9} {'redo ms':>9} {'edit undo ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"undo{size}.db")
+            db = todo.TaskDatabase(path)
+            db.add_tasks(f"Task number {i}" for i in range(size))
+            snapshot = timed(lambda: db.conn.execute('CREATE TEMP TABLE snapshot AS SELECT * FROM tasks'))
+            db.conn.execute('DROP TABLE snapshot')
+
+            def step(method):
+                def run():
+                    getattr(db, method)()
+                    db.flush()
+                return timed(run)
+            clear = step('delete_all_tasks')
+            assert db.get_tasks_page(0, 10) == []
+            undos, redos = [], []
+            for _ in range(repeat):
+                undos.append(step('undo'))
+                redos.append(step('redo'))
+            db.close()
+
+            db = todo.TaskDatabase(path)
+            assert db.get_tasks_page(0, 10) == []
+            db.undo()
+            assert len(db.get_tasks_page(0, size + 1)) == size
+
+            def edit():
+                db.set_completed("Task number 7", True)
+                db.undo()
+                db.redo()
+                db.delete_task("Task number 7")
+                db.undo()
+                db.flush()
+            edits = min(timed(edit) for _ in range(repeat)) / 5
+            assert db.find_task("Task number 7") == (8, 1)
+            db.close()
+            print(f"{size:>10} {snapshot * 1000:>12.2f} {clear * 1000:>14.3f} {min(undos) * 1000:>9.3f} "
+                  f"{min(redos) * 1000:>9.3f} {edits * 1000:>13.3f}")
+
+        # Two windows on one file: each undoes only its own edits
+        path = os.path.join(tmp, "windows.db")
+        first, second = todo.TaskDatabase(path), todo.TaskDatabase(path)
+        first.add_task("First window")
+        first.flush()
+        second.add_task("Second window")
+        second.flush()
+        first.undo()
+        first.flush()
+        assert [row[1] for row in second.get_tasks()] == ["Second window"]
+        first.close()
+        second.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="To-do list benchmarks")
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=500, help="tasks timed for the slow baselines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="task counts for the model, view and startup benchmarks")
+    parser.add_argument("--ops", type=int, default=200, help="operations per model run")
+    parser.add_argument("--clicks", type=int, default=5000, help="adds and removes in the stress run")
+    parser.add_argument("--preload", type=int, default=20_000, help="tasks already stored for the stress run")
+    parser.add_argument("--latency", type=float, default=0.5, help="ms of injected latency per stress call")
+    parser.add_argument("--spike", type=float, default=100, help="ms of every 500th stress call")
+    parser.add_argument("--writers", type=int, default=4, help="writer processes in the sync run")
+    parser.add_argument("--sync-interval", type=int, default=250, help="ms between sync polls")
+    parser.add_argument("--only", choices=[
+        "writes", "lookup", "model", "view", "startup", "stress", "search", "filter", "sync", "undo",
+    ])
+    args = parser.parse_args()
+    sample = min(args.sample, args.tasks)
+    if args.only in (None, "writes"):
+        bench_writes(args.tasks, sample)
+    if args.only in (None, "lookup"):
+        bench_lookup(args.tasks, sample)
+    if args.only in (None, "model"):
+        bench_model(args.sizes, args.ops)
+    if args.only in (None, "view"):
+        bench_view(args.sizes, args.ops)
+    if args.only in (None, "startup"):
+        bench_startup(args.sizes)
+    if args.only in (None, "search"):
+        bench_search(args.tasks)
+    if args.only in (None, "filter"):
+        bench_filter(args.tasks)
+    if args.only in (None, "undo"):
+        bench_undo(args.sizes)
+    if args.only in (None, "sync"):
+        if not bench_sync(args.writers, args.clicks // args.writers, args.sync_interval):
+            sys.exit(1)
+    if args.only in (None, "stress"):
+        if not bench_stress(args.clicks, args.preload, args.latency / 1000, args.spike / 1000):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()